@@ -1,14 +1,28 @@
 import os
-import json
 import hashlib
 import hmac
+from functools import lru_cache
 from urllib.parse import parse_qsl
 from typing import Optional
 
+import orjson
+
 BOT_TOKEN = os.getenv("BOT_TOKEN", "")
 DEV_MODE = os.getenv("DEV_MODE", "").lower() in ("1", "true", "yes")
 
 
+@lru_cache(maxsize=1)
+def _get_secret_key(bot_token: str) -> bytes:
+    """Secret key derived from bot token (constant for the process lifetime)"""
+    return hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+
+
+@lru_cache(maxsize=1)
+def _get_hmac_template(bot_token: str) -> "hmac.HMAC":
+    """Keyed HMAC with ipad/opad states already absorbed; .copy() it per call"""
+    return hmac.new(_get_secret_key(bot_token), digestmod=hashlib.sha256)
+
+
 def validate_telegram_data(init_data: str) -> Optional[dict]:
     """
     Validate Telegram WebApp init data using HMAC-SHA256.
@@ -22,35 +36,38 @@ def validate_telegram_data(init_data: str) -> Optional[dict]:
         try:
             data = dict(parse_qsl(init_data))
             if "user" in data:
-                return json.loads(data["user"])
+                return orjson.loads(data["user"])
         except Exception:
             pass
         return None
 
     try:
-        data = dict(parse_qsl(init_data))
-        received_hash = data.pop("hash", "")
+        # Single pass: split out hash and user, keep the rest for the check string
+        received_hash = ""
+        user_raw = "{}"
+        pairs = []
+        for k, v in parse_qsl(init_data, keep_blank_values=True):
+            if k == "hash":
+                received_hash = v
+                continue
+            if k == "user":
+                user_raw = v
+            pairs.append((k, v))
 
         if not received_hash:
             return None
 
         # Create data check string (sorted alphabetically)
-        data_check_string = "\n".join(
-            f"{k}={v}" for k, v in sorted(data.items())
-        )
-
-        # Create secret key from bot token
-        secret_key = hmac.new(
-            b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256
-        ).digest()
-
-        # Calculate hash
-        calculated_hash = hmac.new(
-            secret_key, data_check_string.encode(), hashlib.sha256
-        ).hexdigest()
-
-        if calculated_hash == received_hash:
-            return json.loads(data.get("user", "{}"))
+        pairs.sort()
+        data_check_string = "\n".join(f"{k}={v}" for k, v in pairs)
+
+        # Calculate hash from the pre-keyed HMAC state
+        mac = _get_hmac_template(BOT_TOKEN).copy()
+        mac.update(data_check_string.encode())
+        calculated_hash = mac.hexdigest()
+
+        if hmac.compare_digest(calculated_hash, received_hash):
+            return orjson.loads(user_raw)
     except Exception:
         pass
 
@@ -4,18 +4,29 @@ VELLA Telegram Bot — group integration.
 import os
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.enums import ParseMode
 
 BOT_TOKEN = os.getenv("BOT_TOKEN", "")
 
+# Pooled connector: keep TLS connections to the Bot API warm between calls
+session = AiohttpSession(limit=100)
+session._connector_init.update(keepalive_timeout=75)
+
 bot = Bot(
     token=BOT_TOKEN,
+    session=session,
     default=DefaultBotProperties(parse_mode=ParseMode.HTML)
 )
 dp = Dispatcher()
 
+# Cap concurrent handler work so update bursts can't pile up unbounded
+from .middlewares import ConcurrencyLimitMiddleware
+dp.update.outer_middleware(ConcurrencyLimitMiddleware(limit=64))
+
 # Register routers
-from .handlers import group_router, callback_router, private_router
+from .handlers import group_router, callback_router, admin_callback_router, private_router
 dp.include_router(group_router)
 dp.include_router(callback_router)
+dp.include_router(admin_callback_router)
 dp.include_router(private_router)
@@ -0,0 +1,28 @@
+"""
+Callback data factories for inline buttons.
+
+Prefixes match the original "name:arg:arg" strings so join buttons
+sent before the switch keep working.
+"""
+from aiogram.filters.callback_data import CallbackData
+
+
+class JoinApproveCB(CallbackData, prefix="join_approve"):
+    request_id: int
+    user_id: int
+
+
+class JoinRejectCB(CallbackData, prefix="join_reject"):
+    request_id: int
+    user_id: int
+
+
+class StarsConfirmCB(CallbackData, prefix="stars_confirm"):
+    log_id: int
+    player_id: int
+    amount: int
+    row: int  # keyboard row of this button (one button per row)
+
+
+class StarsDoneCB(CallbackData, prefix="stars_done"):
+    log_id: int
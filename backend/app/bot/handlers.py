@@ -2,16 +2,21 @@
 Bot command handlers for Telegram group integration.
 """
 import os
+import time
+import asyncio
+import logging
+from typing import Awaitable
 from aiogram import Router, F, Bot
 from aiogram.types import (
-    Message, CallbackQuery,
+    Message, CallbackQuery, ChatMemberUpdated,
     InlineKeyboardMarkup, InlineKeyboardButton,
     ChatMemberAdministrator, ChatMemberOwner,
 )
 from aiogram.filters import Command
 from aiogram.enums import ChatType
-from sqlalchemy import select, desc
+from sqlalchemy import select, update, desc, func
 
+from .callbacks import JoinApproveCB, JoinRejectCB, StarsConfirmCB, StarsDoneCB
 from ..database import async_session
 from ..models import Player, StarRewardLog
 from ..game.rpg.clan_service import (
@@ -30,19 +35,75 @@ ADMIN_TELEGRAM_ID = int(os.getenv("ADMIN_TELEGRAM_ID") or 0)
 
 group_router = Router()
 callback_router = Router()
+
+# Admin-only routers: non-admin updates are dropped at dispatch time
+# (with ADMIN_TELEGRAM_ID unset the filters never match)
 private_router = Router()
+private_router.message.filter(F.from_user.id == ADMIN_TELEGRAM_ID)
+
+admin_callback_router = Router()
+admin_callback_router.callback_query.filter(F.from_user.id == ADMIN_TELEGRAM_ID)
+
+
+logger = logging.getLogger(__name__)
 
 
 # ========== Helpers ==========
 
+# Strong refs to fire-and-forget tasks (asyncio only keeps weak ones)
+_background_tasks: set[asyncio.Task] = set()
+
+
+def run_in_background(coro: Awaitable) -> None:
+    """Запустить корутину в фоне (например, правку сообщения после ответа на callback)."""
+    task = asyncio.create_task(_log_errors(coro))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _log_errors(coro: Awaitable):
+    try:
+        await coro
+    except Exception as e:
+        logger.warning(f"[Bot] Background task failed: {e}")
+
+
+ADMIN_CACHE_TTL = 60.0  # seconds
+ADMIN_CACHE_MAX = 10000
+
+# (chat_id, user_id) -> (checked_at, is_admin)
+_admin_cache: dict[tuple[int, int], tuple[float, bool]] = {}
+
+
 async def is_chat_admin(bot: Bot, chat_id: int, user_id: int) -> bool:
-    """Проверить что user_id является админом чата."""
+    """Проверить что user_id является админом чата (с кэшем на ADMIN_CACHE_TTL)."""
+    key = (chat_id, user_id)
+    now = time.monotonic()
+    cached = _admin_cache.get(key)
+    if cached and now - cached[0] < ADMIN_CACHE_TTL:
+        return cached[1]
+
     try:
         member = await bot.get_chat_member(chat_id, user_id)
-        return isinstance(member, (ChatMemberAdministrator, ChatMemberOwner))
+        is_admin = isinstance(member, (ChatMemberAdministrator, ChatMemberOwner))
     except Exception:
+        # Не кэшируем ошибки сети — следующий вызов спросит Telegram снова
         return False
 
+    if len(_admin_cache) >= ADMIN_CACHE_MAX:
+        for k in [k for k, v in _admin_cache.items() if now - v[0] >= ADMIN_CACHE_TTL]:
+            del _admin_cache[k]
+        if len(_admin_cache) >= ADMIN_CACHE_MAX:
+            _admin_cache.clear()
+    _admin_cache[key] = (now, is_admin)
+    return is_admin
+
+
+@group_router.chat_member()
+async def on_chat_member_updated(event: ChatMemberUpdated):
+    """Сбросить кэш админа при смене статуса участника."""
+    _admin_cache.pop((event.chat.id, event.new_chat_member.user.id), None)
+
 
 # ========== /start — Создание базы ==========
 
@@ -123,11 +184,11 @@ async def cmd_join(message: Message, bot: Bot):
         [
             InlineKeyboardButton(
                 text="Принять",
-                callback_data=f"join_approve:{request_id}:{user_id}"
+                callback_data=JoinApproveCB(request_id=request_id, user_id=user_id).pack()
             ),
             InlineKeyboardButton(
                 text="Отклонить",
-                callback_data=f"join_reject:{request_id}:{user_id}"
+                callback_data=JoinRejectCB(request_id=request_id, user_id=user_id).pack()
             ),
         ]
     ])
@@ -143,15 +204,14 @@ async def cmd_join(message: Message, bot: Bot):
 
 # ========== Callbacks: Принять/Отклонить ==========
 
-@callback_router.callback_query(F.data.startswith("join_approve:"))
-async def cb_approve(callback: CallbackQuery, bot: Bot):
-    parts = callback.data.split(":")
-    request_id = int(parts[1])
-
+@callback_router.callback_query(JoinApproveCB.filter())
+async def cb_approve(callback: CallbackQuery, callback_data: JoinApproveCB, bot: Bot):
     if not await is_chat_admin(bot, callback.message.chat.id, callback.from_user.id):
         await callback.answer("Только админ может принимать заявки!", show_alert=True)
         return
 
+    request_id = callback_data.request_id
+
     success, result = await resolve_join_request(
         request_id=request_id,
         approved=True,
@@ -162,22 +222,22 @@ async def cb_approve(callback: CallbackQuery, bot: Bot):
         await callback.answer(result, show_alert=True)
         return
 
-    await callback.message.edit_text(
+    # Answer first, edit the message in background
+    await callback.answer("Принято!")
+    run_in_background(callback.message.edit_text(
         "Заявка принята! Добро пожаловать на базу!\n"
         "Напиши /play чтобы открыть игру."
-    )
-    await callback.answer("Принято!")
-
+    ))
 
-@callback_router.callback_query(F.data.startswith("join_reject:"))
-async def cb_reject(callback: CallbackQuery, bot: Bot):
-    parts = callback.data.split(":")
-    request_id = int(parts[1])
 
+@callback_router.callback_query(JoinRejectCB.filter())
+async def cb_reject(callback: CallbackQuery, callback_data: JoinRejectCB, bot: Bot):
     if not await is_chat_admin(bot, callback.message.chat.id, callback.from_user.id):
         await callback.answer("Только админ может отклонять заявки!", show_alert=True)
         return
 
+    request_id = callback_data.request_id
+
     success, result = await resolve_join_request(
         request_id=request_id,
         approved=False,
@@ -188,8 +248,8 @@ async def cb_reject(callback: CallbackQuery, bot: Bot):
         await callback.answer(result, show_alert=True)
         return
 
-    await callback.message.edit_text("Заявка отклонена.")
     await callback.answer("Отклонено")
+    run_in_background(callback.message.edit_text("Заявка отклонена."))
 
 
 # ========== /leave — Покинуть базу ==========
@@ -202,6 +262,23 @@ async def cmd_leave(message: Message):
 
 # ========== /base — Информация о базе ==========
 
+ROLE_EMOJI = {"leader": "👑", "officer": "⭐", "member": "🔫"}
+
+BASE_INFO_TEMPLATE = (
+    "<b>🏚 База: {name}</b>\n\n"
+    "<b>Ресурсы:</b>\n"
+    "  🔩 Металл: {metal}\n"
+    "  🪵 Дерево: {wood}\n"
+    "  🍖 Еда: {food}\n"
+    "  🔫 Патроны: {ammo}\n"
+    "  💊 Медикаменты: {meds}\n\n"
+    "<b>Участники ({member_count}):</b>\n"
+    "{members_text}\n\n"
+    "<b>Зданий построено:</b> {building_count}\n\n"
+    "Напиши /play чтобы открыть игру!"
+)
+
+
 @group_router.message(Command("base"), F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}))
 async def cmd_base(message: Message):
     info = await get_clan_info_for_group(message.chat.id)
@@ -213,45 +290,37 @@ async def cmd_base(message: Message):
         )
         return
 
-    role_emoji = {"leader": "👑", "officer": "⭐", "member": "🔫"}
     members_text = "\n".join(
-        f"  {role_emoji.get(m['role'], '•')} @{m['username']} ({m['role']})"
+        f"  {ROLE_EMOJI.get(m['role'], '•')} @{m['username']} ({m['role']})"
         for m in info["members"]
     )
 
-    res = info["resources"]
-
-    await message.reply(
-        f"<b>🏚 База: {info['name']}</b>\n\n"
-        f"<b>Ресурсы:</b>\n"
-        f"  🔩 Металл: {res['metal']}\n"
-        f"  🪵 Дерево: {res['wood']}\n"
-        f"  🍖 Еда: {res['food']}\n"
-        f"  🔫 Патроны: {res['ammo']}\n"
-        f"  💊 Медикаменты: {res['meds']}\n\n"
-        f"<b>Участники ({info['member_count']}):</b>\n"
-        f"{members_text}\n\n"
-        f"<b>Зданий построено:</b> {info['building_count']}\n\n"
-        f"Напиши /play чтобы открыть игру!"
-    )
+    await message.reply(BASE_INFO_TEMPLATE.format(
+        name=info["name"],
+        member_count=info["member_count"],
+        building_count=info["building_count"],
+        members_text=members_text,
+        **info["resources"],
+    ))
 
 
 # ========== /play — Открыть WebApp ==========
 
+PLAY_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(
+            text="🎮 Играть в VELLA",
+            url=WEBAPP_URL,
+        )
+    ]
+])
+
+
 @group_router.message(Command("play"), F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}))
 async def cmd_play(message: Message):
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(
-                text="🎮 Играть в VELLA",
-                url=WEBAPP_URL,
-            )
-        ]
-    ])
-
     await message.reply(
         "Нажми кнопку чтобы открыть игру!",
-        reply_markup=keyboard,
+        reply_markup=PLAY_KEYBOARD,
     )
 
 
@@ -259,9 +328,6 @@ async def cmd_play(message: Message):
 
 @private_router.message(Command("stars"), F.chat.type == ChatType.PRIVATE)
 async def cmd_stars(message: Message):
-    if not ADMIN_TELEGRAM_ID or message.from_user.id != ADMIN_TELEGRAM_ID:
-        return
-
     async with async_session() as db:
         result = await db.execute(
             select(Player)
@@ -296,66 +362,58 @@ async def cmd_stars(message: Message):
 
 # ========== Callback: Подтверждение отправки звёзд ==========
 
-@callback_router.callback_query(F.data.startswith("stars_confirm:"))
-async def cb_stars_confirm(callback: CallbackQuery):
-    if not ADMIN_TELEGRAM_ID or callback.from_user.id != ADMIN_TELEGRAM_ID:
-        await callback.answer("Только админ может подтверждать!", show_alert=True)
-        return
-
-    parts = callback.data.split(":")
-    log_id = int(parts[1])
-    player_id = int(parts[2])
-    amount = int(parts[3])
+@admin_callback_router.callback_query(StarsConfirmCB.filter())
+async def cb_stars_confirm(callback: CallbackQuery, callback_data: StarsConfirmCB):
+    log_id = callback_data.log_id
+    player_id = callback_data.player_id
+    amount = callback_data.amount
 
     async with async_session() as db:
-        # Update log status
+        # Mark log as sent (atomically — no double confirmation)
         result = await db.execute(
-            select(StarRewardLog).where(StarRewardLog.id == log_id)
+            update(StarRewardLog)
+            .where(StarRewardLog.id == log_id, StarRewardLog.status != "sent")
+            .values(status="sent")
+            .returning(StarRewardLog.id)
         )
-        log = result.scalar_one_or_none()
-
-        if not log:
-            await callback.answer("Запись не найдена!", show_alert=True)
-            return
-
-        if log.status == "sent":
-            await callback.answer("Уже подтверждено!", show_alert=True)
+        if result.scalar_one_or_none() is None:
+            result = await db.execute(
+                select(StarRewardLog.id).where(StarRewardLog.id == log_id)
+            )
+            if result.scalar_one_or_none() is None:
+                await callback.answer("Запись не найдена!", show_alert=True)
+            else:
+                await callback.answer("Уже подтверждено!", show_alert=True)
             return
 
-        log.status = "sent"
-
         # Update player balance
         result = await db.execute(
-            select(Player).where(Player.telegram_id == player_id)
+            update(Player)
+            .where(Player.telegram_id == player_id)
+            .values(
+                star_balance=func.greatest(0, func.coalesce(Player.star_balance, 0) - amount),
+                total_stars_earned=func.coalesce(Player.total_stars_earned, 0) + amount,
+            )
+            .returning(Player.username)
         )
-        player = result.scalar_one_or_none()
-
-        if player:
-            player.star_balance = max(0, (player.star_balance or 0) - amount)
-            player.total_stars_earned = (player.total_stars_earned or 0) + amount
+        player_row = result.first()
 
         await db.commit()
 
-    # Update the button text in the message
-    name = f"@{player.username}" if player and player.username else f"id:{player_id}"
-
-    # Rebuild keyboard: mark this button as confirmed
-    if callback.message and callback.message.reply_markup:
-        new_buttons = []
-        for row in callback.message.reply_markup.inline_keyboard:
-            new_row = []
-            for btn in row:
-                if btn.callback_data == callback.data:
-                    new_row.append(InlineKeyboardButton(
-                        text=f"✅ {name} — {amount}⭐ (отправлено)",
-                        callback_data=f"stars_done:{log_id}",
-                    ))
-                else:
-                    new_row.append(btn)
-            new_buttons.append(new_row)
-
-        await callback.message.edit_reply_markup(
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=new_buttons)
-        )
+    name = f"@{player_row.username}" if player_row and player_row.username else f"id:{player_id}"
 
     await callback.answer(f"Отправка {amount}⭐ для {name} подтверждена!")
+
+    # Replace only the pressed button (row is encoded in callback data)
+    if callback.message and callback.message.reply_markup:
+        keyboard = callback.message.reply_markup.inline_keyboard
+        row = callback_data.row
+        if 0 <= row < len(keyboard):
+            keyboard[row] = [InlineKeyboardButton(
+                text=f"✅ {name} — {amount}⭐ (отправлено)",
+                callback_data=StarsDoneCB(log_id=log_id).pack(),
+            )]
+
+            run_in_background(callback.message.edit_reply_markup(
+                reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
+            ))
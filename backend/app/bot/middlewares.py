@@ -0,0 +1,24 @@
+"""
+Dispatcher middlewares.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """Ограничить число одновременно обрабатываемых апдейтов."""
+
+    def __init__(self, limit: int = 64):
+        self._sem = asyncio.Semaphore(limit)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with self._sem:
+            return await handler(event, data)
@@ -1,6 +1,7 @@
 """
 Start bot polling as background asyncio task.
 """
+import asyncio
 import logging
 from aiogram.types import BotCommand, BotCommandScopeAllGroupChats, BotCommandScopeChat
 
@@ -20,18 +21,22 @@ async def set_bot_commands():
         BotCommand(command="base", description="Информация о базе"),
         BotCommand(command="play", description="Открыть игру"),
     ]
-    await bot.set_my_commands(commands, scope=BotCommandScopeAllGroupChats())
+    calls = [bot.set_my_commands(commands, scope=BotCommandScopeAllGroupChats())]
 
     # Register private commands for admin
     admin_id = int(os.getenv("ADMIN_TELEGRAM_ID") or 0)
     if admin_id:
-        try:
-            admin_commands = [
-                BotCommand(command="stars", description="Топ-3 и балансы звёзд"),
-            ]
-            await bot.set_my_commands(admin_commands, scope=BotCommandScopeChat(chat_id=admin_id))
-        except Exception as e:
-            logger.warning(f"[Bot] Could not set admin commands: {e}")
+        admin_commands = [
+            BotCommand(command="stars", description="Топ-3 и балансы звёзд"),
+        ]
+        calls.append(bot.set_my_commands(admin_commands, scope=BotCommandScopeChat(chat_id=admin_id)))
+
+    # Both scopes in parallel
+    group_result, *admin_result = await asyncio.gather(*calls, return_exceptions=True)
+    if isinstance(group_result, Exception):
+        raise group_result
+    if admin_result and isinstance(admin_result[0], Exception):
+        logger.warning(f"[Bot] Could not set admin commands: {admin_result[0]}")
 
 
 async def start_polling():
@@ -40,7 +45,7 @@ async def start_polling():
     await bot.delete_webhook(drop_pending_updates=True)
     await set_bot_commands()
     logger.info("[Bot] Commands registered, polling started")
-    await dp.start_polling(bot)
+    await dp.start_polling(bot, polling_timeout=30, handle_as_tasks=True)
 
 
 async def stop_polling():
@@ -0,0 +1,41 @@
+"""
+Redis cache shared by the API and the Telegram bot.
+Cache failures are never fatal — callers fall back to the database.
+"""
+import os
+from typing import Any, Optional
+
+import orjson
+import redis.asyncio as redis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
+
+redis_client = redis.from_url(REDIS_URL)
+
+
+async def cache_get_json(key: str) -> Optional[Any]:
+    """Get a JSON value from cache (None on miss or Redis error)"""
+    try:
+        raw = await redis_client.get(key)
+    except Exception as e:
+        print(f"[Cache] GET {key} failed: {e}")
+        return None
+    if raw is None:
+        return None
+    return orjson.loads(raw)
+
+
+async def cache_set_json(key: str, value: Any, ttl: int):
+    """Store a JSON value with TTL in seconds"""
+    try:
+        await redis_client.setex(key, ttl, orjson.dumps(value))
+    except Exception as e:
+        print(f"[Cache] SET {key} failed: {e}")
+
+
+async def cache_delete(*keys: str):
+    """Invalidate cache keys"""
+    try:
+        await redis_client.delete(*keys)
+    except Exception as e:
+        print(f"[Cache] DEL {keys} failed: {e}")
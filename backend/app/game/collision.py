@@ -2,7 +2,7 @@
 Collision detection utilities.
 """
 import math
-from typing import Tuple
+from typing import List, Sequence, Tuple
 
 
 def distance(x1: float, y1: float, x2: float, y2: float) -> float:
@@ -56,12 +56,68 @@ def line_circle_intersection(
     return (0 <= t1 <= 1) or (0 <= t2 <= 1)
 
 
+def line_circle_hits(
+    x1: float, y1: float,  # line start
+    x2: float, y2: float,  # line end
+    circles: Sequence[Tuple[float, float, float]]  # (cx, cy, r) per circle
+) -> List[int]:
+    """
+    Batch version of line_circle_intersection for one segment against many
+    circles. Returns indices of intersected circles in input order.
+    Segment terms are computed once; circles outside the segment's
+    bounding box are rejected before any quadratic math.
+
+    With f(t) = a*t^2 + b*t + c, a root lies in [0, 1] iff f(0) and f(1)
+    differ in sign (or one is zero), or both are positive and the vertex
+    -b/2a sits in [0, 1] with a non-negative discriminant - no sqrt or
+    division per circle.
+    """
+    dx = x2 - x1
+    dy = y2 - y1
+    a = dx * dx + dy * dy
+    if a == 0:
+        # Zero-length segment: the quadratic degenerates, so test the point
+        return [
+            i for i, (cx, cy, r) in enumerate(circles)
+            if (x1 - cx) * (x1 - cx) + (y1 - cy) * (y1 - cy) <= r * r
+        ]
+    two_a = 2 * a
+    min_x, max_x = (x1, x2) if x1 <= x2 else (x2, x1)
+    min_y, max_y = (y1, y2) if y1 <= y2 else (y2, y1)
+
+    hits = []
+    add_hit = hits.append
+    for i, (cx, cy, r) in enumerate(circles):
+        # Broadphase: bounding box of segment expanded by radius
+        if cx + r < min_x or cx - r > max_x or cy + r < min_y or cy - r > max_y:
+            continue
+
+        fx = x1 - cx
+        fy = y1 - cy
+        b = 2 * (fx * dx + fy * dy)
+        c = fx * fx + fy * fy - r * r  # f(0)
+        c_end = a + b + c  # f(1)
+
+        if c > 0 and c_end > 0:
+            # Both ends outside: hit only if the segment dips into the circle
+            if 0 <= -b <= two_a and b * b - 4 * a * c >= 0:
+                add_hit(i)
+        elif c < 0 and c_end < 0:
+            # Both ends strictly inside - no boundary crossing
+            continue
+        else:
+            add_hit(i)
+
+    return hits
+
+
 def normalize(x: float, y: float) -> Tuple[float, float]:
     """Normalize a vector"""
-    length = math.sqrt(x * x + y * y)
-    if length == 0:
+    l2 = x * x + y * y
+    if l2 == 0:
         return 0.0, 0.0
-    return x / length, y / length
+    inv = 1.0 / math.sqrt(l2)
+    return x * inv, y * inv
 
 
 def angle_to_vector(angle: float) -> Tuple[float, float]:
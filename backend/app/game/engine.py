@@ -39,43 +39,51 @@ class GameEngine:
     async def _game_loop(self):
         """Main game loop - runs at fixed tick rate"""
         dt = 1.0 / self.TICK_RATE
-        tick_counter = 0
+        loop = asyncio.get_running_loop()
+        next_deadline = loop.time()
 
         while self.running:
-            loop_start = asyncio.get_event_loop().time()
 
-            # Update all active rooms
-            for room in list(self.room_manager.rooms.values()):
-                if room.status in ("countdown", "playing"):
-                    try:
-                        events = room.update(dt)
-
-                        # Debug log every 40 ticks (2 seconds)
-                        tick_counter += 1
-                        if tick_counter % 40 == 0:
-                            print(f"[Engine] Room {room.room_code}: status={room.status}, zombies={len(room.zombies)}, players={len(room.players)}")
-
-                        # Broadcast events
-                        for event in events:
-                            await room.broadcast(event)
-
-                        # Broadcast state every tick
-                        await room.broadcast(room.get_state())
-
-                    except Exception as e:
+            # Update all active rooms concurrently so one slow client
+            # doesn't stall the tick for every other room
+            active = [
+                r for r in self.room_manager.rooms.values()
+                if r.status in ("countdown", "playing")
+            ]
+            if active:
+                results = await asyncio.gather(
+                    *(self._tick_room(room, dt) for room in active),
+                    return_exceptions=True
+                )
+                for room, result in zip(active, results):
+                    if isinstance(result, Exception):
                         import traceback
-                        print(f"Error updating room {room.room_code}: {e}")
-                        traceback.print_exc()
-
-                # Clean up empty rooms
-                if room.is_empty:
-                    self.room_manager.remove_room(room.room_code)
-
-            # Sleep to maintain tick rate
-            elapsed = asyncio.get_event_loop().time() - loop_start
-            sleep_time = dt - elapsed
-            if sleep_time > 0:
-                await asyncio.sleep(sleep_time)
+                        print(f"Error updating room {room.room_code}: {result}")
+                        traceback.print_exception(result)
+
+            # Sleep until the next fixed-timestep deadline (no drift)
+            next_deadline += dt
+            delay = next_deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Fell behind - resync instead of bursting to catch up
+                next_deadline = loop.time()
+
+    async def _tick_room(self, room: Room, dt: float):
+        """Update one room and broadcast its events and state"""
+        events = room.update(dt)
+
+        # Debug log every 40 ticks (2 seconds)
+        if room.tick % 40 == 0:
+            print(f"[Engine] Room {room.room_code}: status={room.status}, zombies={len(room.zombies)}, players={len(room.players)}")
+
+        # Broadcast events (in order, before state)
+        for event in events:
+            await room.broadcast(event)
+
+        # Broadcast state (skipped when nothing changed since last tick)
+        await room.broadcast_state()
 
     def get_room(self, room_code: str) -> Room:
         """Get or create a room"""
@@ -2,17 +2,29 @@
 Player entity for the game.
 """
 import math
+import random
 import time
 from typing import Optional, Dict, Any
-from .weapons import get_weapon, get_starter_weapon
-from .collision import clamp, normalize
+from .weapons import get_weapon, get_starter_weapon, get_spread_table, SPREAD_TABLE_SIZE
+from .collision import clamp
 
 
 class PlayerEntity:
+    __slots__ = (
+        "id", "username", "x", "y",
+        "hp", "max_hp", "is_dead", "death_time_ns",
+        "weapon_code", "ammo", "reloading", "reload_timer", "fire_cooldown",
+        "move_x", "move_y", "aim_x", "aim_y", "shooting", "wants_reload",
+        "kills", "coins_earned", "is_ready",
+        "_aim_angle", "_weapon_dict", "_fire_period", "_reload_time", "_mag_size",
+        "_spread", "_pellets", "_proj_speed", "_damage", "_spread_lut", "_spread_idx",
+    )
+
     # Game constants
     SPEED = 200  # pixels per second
     MAX_HP = 100
     RESPAWN_TIME = 3.0  # seconds
+    RESPAWN_NS = int(RESPAWN_TIME * 1_000_000_000)
     PLAYER_SIZE = 20  # collision radius
 
     def __init__(self, player_id: int, username: Optional[str], x: float, y: float):
@@ -27,7 +39,7 @@ class PlayerEntity:
         self.hp = self.MAX_HP
         self.max_hp = self.MAX_HP
         self.is_dead = False
-        self.death_time = 0.0
+        self.death_time_ns = 0
 
         # Weapon
         self.weapon_code = get_starter_weapon()
@@ -35,12 +47,14 @@ class PlayerEntity:
         self.reloading = False
         self.reload_timer = 0.0
         self.fire_cooldown = 0.0
+        self._load_weapon()
 
         # Input state
         self.move_x = 0.0
         self.move_y = 0.0
         self.aim_x = 0.0
         self.aim_y = 1.0  # Default aim up
+        self._aim_angle = math.atan2(self.aim_y, self.aim_x)
         self.shooting = False
         self.wants_reload = False
 
@@ -54,20 +68,34 @@ class PlayerEntity:
         # Initialize ammo
         self._refill_ammo()
 
+    def _load_weapon(self):
+        """Resolve weapon stats once per weapon change instead of every tick"""
+        w = get_weapon(self.weapon_code)
+        self._weapon_dict = w
+        self._fire_period = 1.0 / w["fire_rate"]
+        self._reload_time = w["reload_time"]
+        self._mag_size = w["magazine_size"]
+        self._spread = w["spread"]
+        # Each player walks the shared table from its own random offset
+        self._spread_lut = get_spread_table(self.weapon_code)
+        self._spread_idx = random.randrange(SPREAD_TABLE_SIZE)
+        self._pellets = w.get("pellets", 1)
+        self._proj_speed = w["projectile_speed"]
+        self._damage = w["damage"]
+
     def _refill_ammo(self):
         """Fill ammo to magazine size"""
-        weapon = get_weapon(self.weapon_code)
-        self.ammo = weapon["magazine_size"]
+        self.ammo = self._mag_size
 
     @property
     def aim_angle(self) -> float:
         """Get aim angle in radians"""
-        return math.atan2(self.aim_y, self.aim_x)
+        return self._aim_angle
 
     @property
     def weapon(self) -> dict:
         """Get current weapon data"""
-        return get_weapon(self.weapon_code)
+        return self._weapon_dict
 
     def apply_input(self, move_x: float, move_y: float, aim_x: float, aim_y: float,
                     shooting: bool, reload: bool):
@@ -77,11 +105,16 @@ class PlayerEntity:
 
         # Only update aim if joystick is being used
         if abs(aim_x) > 0.1 or abs(aim_y) > 0.1:
-            # Normalize aim vector
-            length = math.sqrt(aim_x * aim_x + aim_y * aim_y)
-            if length > 0:
-                self.aim_x = aim_x / length
-                self.aim_y = aim_y / length
+            # Normalize aim vector (client usually sends it already unit length)
+            l2 = aim_x * aim_x + aim_y * aim_y
+            if abs(l2 - 1.0) < 1e-3:
+                self.aim_x = aim_x
+                self.aim_y = aim_y
+            else:
+                inv = 1.0 / math.sqrt(l2)
+                self.aim_x = aim_x * inv
+                self.aim_y = aim_y * inv
+            self._aim_angle = math.atan2(self.aim_y, self.aim_x)
 
         self.shooting = shooting
         self.wants_reload = reload
@@ -96,53 +129,51 @@ class PlayerEntity:
 
         # Movement
         if abs(self.move_x) > 0.01 or abs(self.move_y) > 0.01:
-            # Normalize diagonal movement
-            nx, ny = normalize(self.move_x, self.move_y)
-            self.x += nx * self.SPEED * dt
-            self.y += ny * self.SPEED * dt
+            # Normalize diagonal movement, folding speed into the scale
+            step = self.SPEED * dt / math.sqrt(self.move_x * self.move_x + self.move_y * self.move_y)
+            self.x += self.move_x * step
+            self.y += self.move_y * step
 
             # Clamp to game bounds (with margin for player size)
             margin = self.PLAYER_SIZE
             self.x = clamp(self.x, margin, game_width - margin)
             self.y = clamp(self.y, margin, game_height - margin)
 
-        # Update fire cooldown
-        if self.fire_cooldown > 0:
-            self.fire_cooldown -= dt
+        # Timers are stepped in locals and written back once; a plain compare
+        # is cheaper in CPython than max() or boolean-multiply clamping
+        cooldown = self.fire_cooldown
+        if cooldown > 0:
+            cooldown -= dt
 
         # Handle reload
         if self.reloading:
-            self.reload_timer -= dt
-            if self.reload_timer <= 0:
+            timer = self.reload_timer - dt
+            if timer <= 0:
                 self._refill_ammo()
                 self.reloading = False
-                self.reload_timer = 0.0
-        elif self.wants_reload and self.ammo < self.weapon["magazine_size"]:
+                timer = 0.0
+            self.reload_timer = timer
+        elif self.wants_reload and self.ammo < self._mag_size:
             self._start_reload()
 
         # Check if can shoot
-        can_shoot = (
-            self.shooting and
-            not self.reloading and
-            self.ammo > 0 and
-            self.fire_cooldown <= 0
-        )
-
-        if can_shoot:
+        if self.shooting and cooldown <= 0 and self.ammo > 0 and not self.reloading:
             self.ammo -= 1
-            self.fire_cooldown = 1.0 / self.weapon["fire_rate"]
+            self.fire_cooldown = self._fire_period
 
             # Auto-reload when empty
             if self.ammo == 0:
                 self._start_reload()
+            return True
 
-        return can_shoot
+        self.fire_cooldown = cooldown
+        return False
 
     def _start_reload(self):
         """Start reloading"""
         if not self.reloading:
             self.reloading = True
-            self.reload_timer = self.weapon["reload_time"]
+            self.reload_timer = self._reload_time
 
     def take_damage(self, damage: int) -> bool:
         """Take damage, returns True if player died"""
@@ -153,7 +184,7 @@ class PlayerEntity:
         if self.hp <= 0:
             self.hp = 0
             self.is_dead = True
-            self.death_time = time.time()
+            self.death_time_ns = time.monotonic_ns()
             return True
         return False
 
@@ -170,13 +201,14 @@ class PlayerEntity:
         """Check if enough time has passed to respawn"""
         if not self.is_dead:
             return False
-        return time.time() - self.death_time >= self.RESPAWN_TIME
+        return time.monotonic_ns() - self.death_time_ns >= self.RESPAWN_NS
 
     def switch_weapon(self, weapon_code: str):
         """Switch to a different weapon"""
         from .weapons import WEAPONS
         if weapon_code in WEAPONS:
             self.weapon_code = weapon_code
+            self._load_weapon()
             self._refill_ammo()
             self.reloading = False
             self.fire_cooldown = 0.5  # Brief cooldown on weapon switch
@@ -191,16 +223,16 @@ class PlayerEntity:
         return {
             "id": self.id,
             "username": self.username,
-            "x": round(self.x, 1),
-            "y": round(self.y, 1),
+            "x": round(self.x * 10) / 10,
+            "y": round(self.y * 10) / 10,
             "hp": self.hp,
             "max_hp": self.max_hp,
             "weapon": self.weapon_code,
             "ammo": self.ammo,
-            "max_ammo": self.weapon["magazine_size"],
+            "max_ammo": self._mag_size,
             "reloading": self.reloading,
-            "reload_progress": 1.0 - (self.reload_timer / self.weapon["reload_time"]) if self.reloading else 1.0,
-            "aim_angle": round(self.aim_angle, 2),
+            "reload_progress": 1.0 - (self.reload_timer / self._reload_time) if self.reloading else 1.0,
+            "aim_angle": round(self._aim_angle * 100) / 100,
             "is_dead": self.is_dead
         }
 
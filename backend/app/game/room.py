@@ -4,35 +4,47 @@ Room and lobby management.
 import random
 import string
 import asyncio
-from typing import Dict, Optional, List, Set
+import itertools
+from operator import attrgetter, itemgetter
+from typing import Callable, Dict, Optional, List, Tuple
+
+import orjson
 from fastapi import WebSocket
 
 from .player import PlayerEntity
+from .weapons import SPREAD_TABLE_MASK
 from .zombie import ZombieEntity, ZombieSpawner
 from .wave import WaveManager, ZOMBIE_TYPES
-from .collision import circle_collision, line_circle_intersection
+from .collision import line_circle_hits
 
 
 class Projectile:
-    _next_id = 1
+    __slots__ = (
+        "id", "owner_id", "x", "y", "angle", "vx", "vy",
+        "damage", "remaining_damage", "hit_mask",
+    )
+
+    _ids = itertools.count(1)
+
+    def __init__(self, owner_id: int, x: float, y: float, angle: float,
+                 vx: float, vy: float, damage: int):
+        self.reset(owner_id, x, y, angle, vx, vy, damage)
 
-    def __init__(self, owner_id: int, x: float, y: float, angle: float, weapon: dict):
-        self.id = Projectile._next_id
-        Projectile._next_id += 1
+    def reset(self, owner_id: int, x: float, y: float, angle: float,
+              vx: float, vy: float, damage: int):
+        """(Re)initialize all fields - lets rooms recycle projectiles from a pool"""
+        self.id = next(Projectile._ids)
 
         self.owner_id = owner_id
         self.x = x
         self.y = y
         self.angle = angle
-        self.speed = weapon["projectile_speed"]
-        self.damage = weapon["damage"]
-        self.remaining_damage = weapon["damage"]  # Damage left to deal
-        self.hit_zombies: Set[int] = set()  # Track already hit zombies
-
-        # Calculate velocity
-        import math
-        self.vx = math.cos(angle) * self.speed
-        self.vy = math.sin(angle) * self.speed
+        self.vx = vx
+        self.vy = vy
+        self.damage = damage
+        self.remaining_damage = damage  # Damage left to deal
+        # Zombies already hit, one bit per zombie slot (see Room._alloc_zombie_slot)
+        self.hit_mask = 0
 
     def update(self, dt: float) -> bool:
         """Update position, returns True if should be removed (out of bounds)"""
@@ -42,14 +54,15 @@ class Projectile:
         # Remove if out of bounds (with margin)
         return self.x < -100 or self.x > 2000 or self.y < -200 or self.y > 1200
 
-    def to_state(self) -> dict:
-        return {
-            "id": self.id,
-            "x": round(self.x, 1),
-            "y": round(self.y, 1),
-            "angle": round(self.angle, 2),
-            "owner_id": self.owner_id
-        }
+    def to_state(self) -> tuple:
+        """Compact (id, x, y, angle, owner_id) row - projectiles are the bulk of each state frame"""
+        return (
+            self.id,
+            round(self.x * 10) / 10,
+            round(self.y * 10) / 10,
+            round(self.angle * 100) / 100,
+            self.owner_id
+        )
 
 
 class Room:
@@ -60,10 +73,22 @@ class Room:
     TICK_RATE = 20  # ticks per second
     MAX_PLAYERS = 10
     WAVE_COUNTDOWN = 3.0  # seconds before wave starts
-
-    def __init__(self, room_code: str, is_public: bool = False):
+    STATE_KEYFRAME_TICKS = 20  # full state keyframe at least once per second
+    STATE_ENTITY_KEYS = ("players", "zombies", "projectiles")
+    STATE_ENTITY_ID = {
+        "players": itemgetter("id"),
+        "zombies": itemgetter("id"),
+        "projectiles": itemgetter(0),
+    }
+    BROADCAST_BATCH = 8  # concurrent sends per batch in broadcast()
+    PROJECTILE_POOL_MAX = 512  # spent projectiles kept for reuse
+    ZGRID_CELL = 128  # spatial hash cell size (px) for projectile broadphase
+
+    def __init__(self, room_code: str, is_public: bool = False,
+                 on_empty: Optional[Callable[[str], None]] = None):
         self.room_code = room_code
         self.is_public = is_public
+        self._on_empty = on_empty  # called with room_code when the last player leaves
         self.status = "lobby"  # lobby, countdown, wave_break, playing, finished
 
         # Players
@@ -73,6 +98,10 @@ class Room:
         # Game state
         self.zombies: Dict[int, ZombieEntity] = {}
         self.projectiles: Dict[int, Projectile] = {}
+        self._projectile_pool: List[Projectile] = []
+        # Dense zombie slots for projectile hit bitmasks
+        self._free_zombie_slots: List[int] = []
+        self._next_zombie_slot = 0
         self.wave_manager = WaveManager()
         self.zombie_spawner = ZombieSpawner(self.GAME_WIDTH, self.GAME_HEIGHT)
 
@@ -83,6 +112,12 @@ class Room:
         # Stats
         self.total_kills = 0
 
+        # Last broadcast state for delta compression: entities by id per
+        # list, plus the remaining scalar fields (without tick)
+        self._last_entities: Optional[Dict[str, Dict[int, dict]]] = None
+        self._last_meta: Optional[dict] = None
+        self._last_state_tick = 0
+
     def add_player(self, player_id: int, username: Optional[str], ws: WebSocket) -> PlayerEntity:
         """Add a player to the room"""
         # Spawn position at bottom of screen
@@ -93,6 +128,9 @@ class Room:
         self.players[player_id] = player
         self.connections[player_id] = ws
 
+        # Newcomer has no baseline for deltas - send a keyframe next tick
+        self._last_entities = None
+
         return player
 
     def remove_player(self, player_id: int):
@@ -100,6 +138,9 @@ class Room:
         self.players.pop(player_id, None)
         self.connections.pop(player_id, None)
 
+        if not self.players and self._on_empty is not None:
+            self._on_empty(self.room_code)
+
     def get_player(self, player_id: int) -> Optional[PlayerEntity]:
         return self.players.get(player_id)
 
@@ -127,23 +168,80 @@ class Room:
 
     async def broadcast(self, message: dict):
         """Send message to all players in room"""
+        # Serialize once for all clients
+        payload = orjson.dumps(message).decode()
+        targets = list(self.connections.items())
         disconnected = []
-        for player_id, ws in self.connections.items():
-            try:
-                await ws.send_json(message)
-            except Exception:
-                disconnected.append(player_id)
+
+        # Send concurrently so one slow socket doesn't hold up the rest,
+        # yielding between batches to keep the event loop responsive
+        batch = self.BROADCAST_BATCH
+        for start in range(0, len(targets), batch):
+            chunk = targets[start:start + batch]
+            results = await asyncio.gather(
+                *(ws.send_text(payload) for _, ws in chunk),
+                return_exceptions=True
+            )
+            for (player_id, _), result in zip(chunk, results):
+                if isinstance(result, Exception):
+                    disconnected.append(player_id)
+            if start + batch < len(targets):
+                await asyncio.sleep(0)
 
         # Clean up disconnected
         for player_id in disconnected:
             self.remove_player(player_id)
 
+    async def broadcast_state(self):
+        """
+        Broadcast game state. A full "state" keyframe goes out every
+        STATE_KEYFRAME_TICKS; in between only entities that changed are sent
+        as "state_delta", and nothing at all if the state is unchanged.
+        """
+        state = self.get_state()
+        entities = {
+            key: {entity_id(e): e for e in state[key]}
+            for key, entity_id in self.STATE_ENTITY_ID.items()
+        }
+        meta = {
+            k: v for k, v in state.items()
+            if k not in self.STATE_ENTITY_KEYS and k != "type" and k != "tick"
+        }
+
+        if (self._last_entities is None
+                or self.tick - self._last_state_tick >= self.STATE_KEYFRAME_TICKS):
+            self._last_entities = entities
+            self._last_meta = meta
+            self._last_state_tick = self.tick
+            await self.broadcast(state)
+            return
+
+        delta = {"type": "state_delta", "tick": state["tick"]}
+        changed = meta != self._last_meta
+        for key in self.STATE_ENTITY_KEYS:
+            prev = self._last_entities[key]
+            cur = entities[key]
+            updated = [e for eid, e in cur.items() if prev.get(eid) != e]
+            removed = [eid for eid in prev if eid not in cur]
+            delta[key] = updated
+            delta[f"removed_{key}"] = removed
+            if updated or removed:
+                changed = True
+
+        if not changed:
+            return
+
+        self._last_entities = entities
+        self._last_meta = meta
+        delta.update(meta)
+        await self.broadcast(delta)
+
     async def send_to_player(self, player_id: int, message: dict):
         """Send message to specific player"""
         ws = self.connections.get(player_id)
         if ws:
             try:
-                await ws.send_json(message)
+                await ws.send_text(orjson.dumps(message).decode())
             except Exception:
                 self.remove_player(player_id)
 
@@ -185,12 +283,14 @@ class Room:
             # Spawn zombies
             for zombie_type in self.wave_manager.update(dt):
                 zombie = self.zombie_spawner.spawn_zombie(zombie_type)
+                zombie.slot = self._alloc_zombie_slot()
                 self.zombies[zombie.id] = zombie
                 print(f"[Room {self.room_code}] Spawned zombie {zombie.id} type={zombie_type} at ({zombie.x:.0f}, {zombie.y:.0f})")
 
-            # Update players
-            players_list = list(self.players.values())
-            for player in players_list:
+            # Update players. Nothing below adds or removes players or zombies
+            # until projectiles resolve, so iterate the dict views directly.
+            players = self.players.values()
+            for player in players:
                 if player.is_dead and player.can_respawn():
                     # Respawn player
                     x = self.GAME_WIDTH / 2 + random.uniform(-100, 100)
@@ -208,8 +308,8 @@ class Room:
                         self._create_projectiles(player, events)
 
             # Update zombies
-            for zombie in list(self.zombies.values()):
-                attacked_player_id = zombie.update(dt, players_list)
+            for zombie in self.zombies.values():
+                attacked_player_id = zombie.update(dt, players)
                 if attacked_player_id:
                     player = self.players.get(attacked_player_id)
                     if player and player.take_damage(zombie.damage):
@@ -227,18 +327,17 @@ class Room:
                 bonus = self.wave_manager.get_wave_bonus()
 
                 # Distribute bonus to alive players
-                alive_players = [p for p in self.players.values() if not p.is_dead]
-                if alive_players:
-                    bonus_per_player = bonus // len(alive_players)
-                    for p in alive_players:
-                        p.coins_earned += bonus_per_player
+                alive_count = sum(1 for p in self.players.values() if not p.is_dead)
+                bonus_per_player = bonus // alive_count if alive_count else 0
 
                 # Go to wave break - wait for all players to ready up
                 self.status = "wave_break"
                 self.wave_manager.wave_active = False
 
-                # Reset ready status and heal all players
+                # Pay the bonus, reset ready status and heal all players in one pass
                 for p in self.players.values():
+                    if not p.is_dead:
+                        p.coins_earned += bonus_per_player
                     p.is_ready = False
                     p.hp = p.max_hp
                     p.is_dead = False
@@ -262,28 +361,50 @@ class Room:
 
     def _create_projectiles(self, player: PlayerEntity, events: list):
         """Create projectiles when player shoots"""
-        import math
-        weapon = player.weapon
-        pellets = weapon.get("pellets", 1)
-        spread = weapon["spread"]
-
-        for _ in range(pellets):
-            # Add spread to angle
-            angle = player.aim_angle + random.uniform(-spread, spread)
-
-            projectile = Projectile(
-                owner_id=player.id,
-                x=player.x,
-                y=player.y,
-                angle=angle,
-                weapon=weapon
-            )
+        speed = player._proj_speed
+        damage = player._damage
+        base_angle = player.aim_angle
+        # aim_x/aim_y are already the unit aim vector
+        ax, ay = player.aim_x, player.aim_y
+        lut = player._spread_lut
+        idx = player._spread_idx
+        pool = self._projectile_pool
+
+        for _ in range(player._pellets):
+            # Rotate the aim vector by the next precomputed spread sample
+            d, cos_d, sin_d = lut[idx]
+            idx = (idx + 1) & SPREAD_TABLE_MASK
+            dx = ax * cos_d - ay * sin_d
+            dy = ay * cos_d + ax * sin_d
+
+            if pool:
+                projectile = pool.pop()
+                projectile.reset(player.id, player.x, player.y, base_angle + d,
+                                 dx * speed, dy * speed, damage)
+            else:
+                projectile = Projectile(
+                    owner_id=player.id,
+                    x=player.x,
+                    y=player.y,
+                    angle=base_angle + d,
+                    vx=dx * speed,
+                    vy=dy * speed,
+                    damage=damage
+                )
             self.projectiles[projectile.id] = projectile
 
+        player._spread_idx = idx
+
     def _update_projectiles(self, dt: float, events: list):
         """Update projectiles and check collisions"""
         to_remove = []
 
+        # Zombies don't move while projectiles update - snapshot once per tick
+        targets = list(self.zombies.values())
+        circles = [(z.x, z.y, z.size) for z in targets]
+        grid = self._build_zombie_grid(circles)
+        cell = self.ZGRID_CELL
+
         for proj in self.projectiles.values():
             old_x, old_y = proj.x, proj.y
 
@@ -291,77 +412,128 @@ class Room:
                 to_remove.append(proj.id)
                 continue
 
+            # Nothing to hit (between spawns / wave end) - skip the sweep
+            if not grid:
+                continue
+
+            # Candidates: zombies bucketed in cells under the swept segment
+            candidates = set()
+            for gx in range(int(min(old_x, proj.x) // cell), int(max(old_x, proj.x) // cell) + 1):
+                for gy in range(int(min(old_y, proj.y) // cell), int(max(old_y, proj.y) // cell) + 1):
+                    bucket = grid.get((gx, gy))
+                    if bucket:
+                        candidates.update(bucket)
+            if not candidates:
+                continue
+            order = sorted(candidates)  # keep zombie spawn order for hit resolution
+
             # Check collision with zombies
-            for zombie in list(self.zombies.values()):
-                # Skip if already hit this zombie
-                if zombie.id in proj.hit_zombies:
+            for i in line_circle_hits(old_x, old_y, proj.x, proj.y, [circles[k] for k in order]):
+                zombie = targets[order[i]]
+
+                # Skip if killed earlier this tick or already hit this zombie
+                if zombie.id not in self.zombies or proj.hit_mask >> zombie.slot & 1:
                     continue
 
-                if line_circle_intersection(
-                    old_x, old_y, proj.x, proj.y,
-                    zombie.x, zombie.y, zombie.size
-                ):
-                    # Mark as hit
-                    proj.hit_zombies.add(zombie.id)
+                # Mark as hit
+                proj.hit_mask |= 1 << zombie.slot
 
-                    # Calculate damage: min of remaining damage and zombie HP
-                    zombie_hp_before = zombie.hp
-                    damage_to_deal = min(proj.remaining_damage, zombie_hp_before)
+                # Calculate damage: min of remaining damage and zombie HP
+                zombie_hp_before = zombie.hp
+                damage_to_deal = min(proj.remaining_damage, zombie_hp_before)
 
-                    if zombie.take_damage(damage_to_deal):
-                        # Zombie killed
-                        player = self.players.get(proj.owner_id)
-                        if player:
-                            player.add_kill(zombie.coins)
-                        self.total_kills += 1
+                if zombie.take_damage(damage_to_deal):
+                    # Zombie killed
+                    player = self.players.get(proj.owner_id)
+                    if player:
+                        player.add_kill(zombie.coins)
+                    self.total_kills += 1
 
-                        events.append({
-                            "type": "zombie_killed",
-                            "zombie_id": zombie.id,
-                            "killer_id": proj.owner_id,
-                            "coins": zombie.coins,
-                            "zombie_type": zombie.type
-                        })
-                        del self.zombies[zombie.id]
-                    else:
-                        # Zombie hurt but alive
-                        events.append({
-                            "type": "zombie_hurt",
-                            "zombie_id": zombie.id,
-                            "damage": damage_to_deal
-                        })
+                    events.append({
+                        "type": "zombie_killed",
+                        "zombie_id": zombie.id,
+                        "killer_id": proj.owner_id,
+                        "coins": zombie.coins,
+                        "zombie_type": zombie.type
+                    })
+                    del self.zombies[zombie.id]
+                    self._release_zombie_slot(zombie.slot)
+                else:
+                    # Zombie hurt but alive
+                    events.append({
+                        "type": "zombie_hurt",
+                        "zombie_id": zombie.id,
+                        "damage": damage_to_deal
+                    })
 
-                    # Subtract zombie's HP from remaining damage
-                    proj.remaining_damage -= zombie_hp_before
+                # Subtract zombie's HP from remaining damage
+                proj.remaining_damage -= zombie_hp_before
 
-                    # Remove projectile if no damage left
-                    if proj.remaining_damage <= 0:
-                        to_remove.append(proj.id)
-                        break
+                # Remove projectile if no damage left
+                if proj.remaining_damage <= 0:
+                    to_remove.append(proj.id)
+                    break
 
+        # Return spent projectiles to the pool for reuse
+        pool = self._projectile_pool
         for proj_id in to_remove:
-            self.projectiles.pop(proj_id, None)
+            proj = self.projectiles.pop(proj_id, None)
+            if proj is not None and len(pool) < self.PROJECTILE_POOL_MAX:
+                pool.append(proj)
+
+    def _alloc_zombie_slot(self) -> int:
+        """Give a spawning zombie a free bit index for projectile hit masks"""
+        if self._free_zombie_slots:
+            return self._free_zombie_slots.pop()
+        slot = self._next_zombie_slot
+        self._next_zombie_slot += 1
+        return slot
+
+    def _release_zombie_slot(self, slot: int):
+        """Free a dead zombie's slot, clearing its bit so the next owner starts unhit"""
+        bit = 1 << slot
+        for proj in self.projectiles.values():
+            if proj.hit_mask & bit:
+                proj.hit_mask ^= bit
+        self._free_zombie_slots.append(slot)
+
+    def clear_zombies(self):
+        """Remove all zombies at once and reset slot bookkeeping"""
+        self.zombies.clear()
+        self._free_zombie_slots.clear()
+        self._next_zombie_slot = 0
+        for proj in self.projectiles.values():
+            proj.hit_mask = 0
+
+    def _build_zombie_grid(self, circles: List[Tuple[float, float, float]]) -> Dict[Tuple[int, int], List[int]]:
+        """Bucket circle indices into every grid cell their bounding box touches"""
+        cell = self.ZGRID_CELL
+        grid: Dict[Tuple[int, int], List[int]] = {}
+        for i, (cx, cy, r) in enumerate(circles):
+            for gx in range(int((cx - r) // cell), int((cx + r) // cell) + 1):
+                for gy in range(int((cy - r) // cell), int((cy + r) // cell) + 1):
+                    grid.setdefault((gx, gy), []).append(i)
+        return grid
 
     def _get_game_over_event(self) -> dict:
         """Generate game over event"""
-        player_stats = []
-        total_coins = 0
-
-        for player in self.players.values():
-            total_coins += player.coins_earned
-            player_stats.append({
-                "id": player.id,
-                "username": player.username,
-                "kills": player.kills,
-                "coins": player.coins_earned
-            })
+        # Sort the entities first so the stats list is built exactly once
+        players = sorted(self.players.values(), key=attrgetter("kills"), reverse=True)
 
         return {
             "type": "game_over",
             "wave_reached": self.wave_manager.current_wave,
             "total_kills": self.total_kills,
-            "player_stats": sorted(player_stats, key=lambda x: x["kills"], reverse=True),
-            "coins_earned": total_coins
+            "player_stats": [
+                {
+                    "id": p.id,
+                    "username": p.username,
+                    "kills": p.kills,
+                    "coins": p.coins_earned
+                }
+                for p in players
+            ],
+            "coins_earned": sum(p.coins_earned for p in players)
         }
 
     def get_state(self) -> dict:
@@ -411,7 +583,7 @@ class RoomManager:
             if code not in self.rooms:
                 break
 
-        room = Room(code, is_public=is_public)
+        room = Room(code, is_public=is_public, on_empty=self.remove_room)
         self.rooms[code] = room
         return room
 
@@ -448,11 +620,5 @@ class RoomManager:
         return public_rooms
 
     def remove_room(self, room_code: str):
-        """Remove an empty room"""
+        """Remove an empty room (rooms call this themselves when the last player leaves)"""
         self.rooms.pop(room_code, None)
-
-    def cleanup_empty_rooms(self):
-        """Remove all empty rooms"""
-        empty_codes = [code for code, room in self.rooms.items() if room.is_empty]
-        for code in empty_codes:
-            del self.rooms[code]
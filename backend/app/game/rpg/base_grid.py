@@ -1,54 +1,77 @@
 """
 Base grid utilities — 16x16 grid for clan buildings.
 """
-from typing import List, Tuple, Optional
+import asyncio
+from functools import lru_cache
+from typing import Dict, Optional
 
 BASE_GRID_SIZE = 16  # 16x16 cells
 
 
-def can_place_building(grid: List[List[Optional[int]]], x: int, y: int,
-                       width: int, height: int) -> bool:
-    """
-    Check if a building can be placed at (x, y) with given dimensions.
-    grid: 16x16 array where None = empty, int = building_id
-    """
+# --- Bitmask occupancy ---
+# The whole grid fits in one 256-bit int: cell (x, y) is bit y*16 + x.
+# Placement checks become a single AND instead of a nested loop.
+
+@lru_cache(maxsize=None)
+def _rect_mask(width: int, height: int) -> int:
+    """Mask of a width x height rectangle anchored at cell (0, 0)."""
+    row = (1 << width) - 1
+    mask = 0
+    for dy in range(height):
+        mask |= row << (dy * BASE_GRID_SIZE)
+    return mask
+
+
+def cells_mask(x: int, y: int, width: int, height: int) -> int:
+    """Mask of the cells covered by a rectangle, clipped to the grid."""
+    x0, y0 = max(x, 0), max(y, 0)
+    x1 = min(x + width, BASE_GRID_SIZE)
+    y1 = min(y + height, BASE_GRID_SIZE)
+    if x1 <= x0 or y1 <= y0:
+        return 0
+    return _rect_mask(x1 - x0, y1 - y0) << (y0 * BASE_GRID_SIZE + x0)
+
+
+def can_place_mask(occupancy: int, x: int, y: int, width: int, height: int) -> bool:
+    """Whether a width x height building fits at (x, y) on the given occupancy."""
     if x < 0 or y < 0 or x + width > BASE_GRID_SIZE or y + height > BASE_GRID_SIZE:
         return False
+    return occupancy & (_rect_mask(width, height) << (y * BASE_GRID_SIZE + x)) == 0
 
-    for dy in range(height):
-        for dx in range(width):
-            if grid[y + dy][x + dx] is not None:
-                return False
 
-    return True
+# --- Per-clan occupancy cache ---
+# Buildings only change through building_routes and wall destruction in the
+# world engine (one process), so each clan's mask is kept in memory and
+# patched on place/move/demolish instead of being rebuilt per request.
+# Every load, check and write of a clan's buildings happens under
+# clan_grid_lock, so a cache miss can never store a stale mask.
 
+_clan_occupancy: Dict[int, int] = {}
+_clan_locks: Dict[int, asyncio.Lock] = {}
 
-def place_building(grid: List[List[Optional[int]]], x: int, y: int,
-                   width: int, height: int, building_id: int):
-    """Place a building on the grid."""
-    for dy in range(height):
-        for dx in range(width):
-            grid[y + dy][x + dx] = building_id
-
-
-def remove_building(grid: List[List[Optional[int]]], building_id: int):
-    """Remove a building from the grid."""
-    for y in range(BASE_GRID_SIZE):
-        for x in range(BASE_GRID_SIZE):
-            if grid[y][x] == building_id:
-                grid[y][x] = None
-
-
-def build_grid_from_buildings(buildings: list) -> List[List[Optional[int]]]:
-    """Build grid state from list of building dicts with grid_x, grid_y, width, height, id."""
-    grid = [[None for _ in range(BASE_GRID_SIZE)] for _ in range(BASE_GRID_SIZE)]
-    for b in buildings:
-        w = b.get("width", 1)
-        h = b.get("height", 1)
-        for dy in range(h):
-            for dx in range(w):
-                gy = b["grid_y"] + dy
-                gx = b["grid_x"] + dx
-                if 0 <= gy < BASE_GRID_SIZE and 0 <= gx < BASE_GRID_SIZE:
-                    grid[gy][gx] = b["id"]
-    return grid
+
+def clan_grid_lock(clan_id: int) -> asyncio.Lock:
+    """Lock serializing grid check + write for one clan base."""
+    lock = _clan_locks.get(clan_id)
+    if lock is None:
+        lock = _clan_locks[clan_id] = asyncio.Lock()
+    return lock
+
+
+def get_cached_occupancy(clan_id: int) -> Optional[int]:
+    return _clan_occupancy.get(clan_id)
+
+
+def set_cached_occupancy(clan_id: int, occupancy: int):
+    _clan_occupancy[clan_id] = occupancy
+
+
+def patch_cached_occupancy(clan_id: int, add: int = 0, remove: int = 0):
+    """Apply a committed change to a cached mask (no-op if not cached)."""
+    occupancy = _clan_occupancy.get(clan_id)
+    if occupancy is not None:
+        _clan_occupancy[clan_id] = (occupancy & ~remove) | add
+
+
+def invalidate_clan_occupancy(clan_id: int):
+    _clan_occupancy.pop(clan_id, None)
@@ -2,156 +2,155 @@
 Building REST API routes for clan bases.
 """
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Query
+from functools import partial
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, text, update
+from sqlalchemy.orm import joinedload, raiseload
 
 from ...database import get_db
-from ...models import Clan, ClanMember, Building, BuildingType
-from ...auth import validate_telegram_data
-from .base_grid import can_place_building, build_grid_from_buildings
+from ...models import Clan, ClanMember, Building
+from .base_grid import (
+    can_place_mask, cells_mask, clan_grid_lock,
+    get_cached_occupancy, set_cached_occupancy, patch_cached_occupancy,
+)
+from .clan_service import invalidate_clan_cache_by_id
+from .deps import current_user, require_role
+from .building_types import get_building_type, get_building_type_by_id, get_building_types_json
 from .world_engine import world_engine
 
 router = APIRouter(prefix="/api/buildings", tags=["buildings"])
 
+_require_role = partial(require_role, not_member_detail="Ты не в клане")
 
-def _get_user(init_data: str) -> dict:
-    user = validate_telegram_data(init_data)
-    if not user:
-        raise HTTPException(status_code=401, detail="Ошибка авторизации")
-    return user
 
+# Clan columns a production building can credit
+_CLAN_RESOURCE_COLUMNS = {
+    "metal": Clan.metal,
+    "wood": Clan.wood,
+    "food": Clan.food,
+    "ammo": Clan.ammo,
+    "meds": Clan.meds,
+}
 
-async def _get_clan_membership(telegram_id: int, db: AsyncSession):
-    """Get player's clan membership or raise 400."""
-    result = await db.execute(
-        select(ClanMember).where(ClanMember.player_id == telegram_id)
-    )
-    membership = result.scalar_one_or_none()
-    if not membership:
-        raise HTTPException(status_code=400, detail="Ты не в клане")
-    return membership
+
+async def _get_clan_occupancy(clan_id: int, db: AsyncSession) -> int:
+    """Occupancy mask of a clan base, loaded from the DB on first use."""
+    occupancy = get_cached_occupancy(clan_id)
+    if occupancy is None:
+        result = await db.execute(
+            select(Building.grid_x, Building.grid_y, Building.building_type_id)
+            .where(Building.clan_id == clan_id)
+        )
+        occupancy = 0
+        for grid_x, grid_y, type_id in result.all():
+            bt = get_building_type_by_id(type_id)
+            occupancy |= cells_mask(grid_x, grid_y, bt.width, bt.height)
+        set_cached_occupancy(clan_id, occupancy)
+    return occupancy
 
 
-@router.get("/types")
-async def get_building_types(
-    init_data: str = Query(...),
-    db: AsyncSession = Depends(get_db)
-):
+def _building_mask(building: Building) -> int:
+    """Cells a building currently covers."""
+    bt = get_building_type_by_id(building.building_type_id)
+    return cells_mask(building.grid_x, building.grid_y, bt.width, bt.height)
+
+
+@router.get("/types", dependencies=[Depends(current_user)])
+async def get_building_types(request: Request):
     """Get all building types"""
-    _get_user(init_data)
-
-    result = await db.execute(select(BuildingType))
-    types = []
-    for bt in result.scalars().all():
-        types.append({
-            "id": bt.id,
-            "code": bt.code,
-            "name": bt.name,
-            "category": bt.category,
-            "width": bt.width,
-            "height": bt.height,
-            "max_hp": bt.max_hp,
-            "produces_resource": bt.produces_resource,
-            "production_rate": bt.production_rate,
-            "damage": bt.damage,
-            "fire_rate": bt.fire_rate,
-            "attack_range": bt.attack_range,
-            "cost_metal": bt.cost_metal,
-            "cost_wood": bt.cost_wood,
-            "cost_food": bt.cost_food,
-            "build_time": bt.build_time,
-        })
-
-    return types
+    # Static reference data - serialized once when the cache is loaded
+    content, etag = get_building_types_json()
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=content, media_type="application/json", headers={"ETag": etag})
 
 
 @router.get("")
 async def get_clan_buildings(
-    init_data: str = Query(...),
+    membership=Depends(_require_role()),
     db: AsyncSession = Depends(get_db)
 ):
     """Get buildings for player's clan"""
-    user = _get_user(init_data)
-    membership = await _get_clan_membership(user["id"], db)
 
-    result = await db.execute(
-        select(Building)
-        .options(selectinload(Building.building_type))
-        .where(Building.clan_id == membership.clan_id)
-    )
+    # Shape the response in Postgres: one row of JSON instead of a Python
+    # dict per building. Build progress and produced amount use the same
+    # formulas as the production helpers, evaluated against one timestamp.
+    result = await db.execute(_CLAN_BUILDINGS_JSON_SQL, {
+        "clan_id": membership.clan_id,
+        "now": datetime.utcnow(),
+    })
+    return Response(content=result.scalar_one(), media_type="application/json")
+
+
+_CLAN_BUILDINGS_JSON_SQL = text("""
+    SELECT COALESCE(json_agg(json_build_object(
+        'id', b.id,
+        'type_code', bt.code,
+        'type_name', bt.name,
+        'category', bt.category,
+        'grid_x', b.grid_x,
+        'grid_y', b.grid_y,
+        'width', bt.width,
+        'height', bt.height,
+        'hp', b.hp,
+        'max_hp', bt.max_hp,
+        'level', b.level,
+        'is_active', b.is_active,
+        'is_built', b.build_complete <= p.now,
+        'build_progress', CASE
+            WHEN b.build_started IS NULL OR b.build_complete IS NULL
+                 OR p.now >= b.build_complete
+                 OR b.build_complete <= b.build_started THEN 1.0
+            ELSE LEAST(1.0, EXTRACT(EPOCH FROM p.now - b.build_started)
+                            / EXTRACT(EPOCH FROM b.build_complete - b.build_started))
+        END,
+        'produces_resource', bt.produces_resource,
+        'production_rate', bt.production_rate,
+        'storage_capacity', COALESCE(bt.storage_capacity, 0),
+        'produced_amount', CASE
+            WHEN bt.produces_resource IS NOT NULL AND bt.produces_resource <> ''
+                 AND bt.production_rate > 0 AND b.build_complete <= p.now
+            THEN trunc(EXTRACT(EPOCH FROM p.now - b.last_collected)
+                       * bt.production_rate / 3600)::int
+            ELSE 0
+        END
+    ) ORDER BY b.id), '[]')::text
+    FROM buildings b
+    JOIN building_types bt ON bt.id = b.building_type_id
+    CROSS JOIN (SELECT CAST(:now AS timestamp) AS now) p
+    WHERE b.clan_id = :clan_id
+""")
+
+
+async def _placement_type(
+    building_type_code: str,
+    grid_x: int,
+    grid_y: int,
+    user: dict = Depends(current_user),
+):
+    """Building type of a placement, bounds-checked against the base.
 
-    buildings = []
-    for b in result.scalars().all():
-        bt = b.building_type
-        is_built = b.build_complete and b.build_complete <= datetime.utcnow()
-
-        # Calculate produced resources
-        produced = 0
-        if bt.produces_resource and bt.production_rate > 0 and is_built:
-            hours_since = (datetime.utcnow() - b.last_collected).total_seconds() / 3600
-            produced = int(hours_since * bt.production_rate)
-
-        buildings.append({
-            "id": b.id,
-            "type_code": bt.code,
-            "type_name": bt.name,
-            "category": bt.category,
-            "grid_x": b.grid_x,
-            "grid_y": b.grid_y,
-            "width": bt.width,
-            "height": bt.height,
-            "hp": b.hp,
-            "max_hp": bt.max_hp,
-            "level": b.level,
-            "is_active": b.is_active,
-            "is_built": is_built,
-            "build_progress": _build_progress(b),
-            "produces_resource": bt.produces_resource,
-            "production_rate": bt.production_rate,
-            "storage_capacity": getattr(bt, 'storage_capacity', 0),
-            "produced_amount": produced,
-        })
-
-    return buildings
-
-
-def _build_progress(building: Building) -> float:
-    """Calculate build progress 0.0 - 1.0"""
-    if not building.build_started or not building.build_complete:
-        return 1.0
-    now = datetime.utcnow()
-    if now >= building.build_complete:
-        return 1.0
-    total = (building.build_complete - building.build_started).total_seconds()
-    elapsed = (now - building.build_started).total_seconds()
-    return min(1.0, elapsed / total) if total > 0 else 1.0
+    Cheap checks first: type and base bounds need no DB round trip, so this
+    is declared ahead of the membership dependency (auth still answers first).
+    """
+    bt = get_building_type(building_type_code)
+    if not bt:
+        raise HTTPException(status_code=404, detail="Тип здания не найден")
+    if not can_place_mask(0, grid_x, grid_y, bt.width, bt.height):
+        raise HTTPException(status_code=400, detail="Нельзя поставить — место занято или за пределами базы")
+    return bt
 
 
 @router.post("/place")
 async def place_building(
-    building_type_code: str,
     grid_x: int,
     grid_y: int,
-    init_data: str = Query(...),
+    bt=Depends(_placement_type),
+    membership=Depends(_require_role("leader", "officer", detail="Строить могут только лидер и офицер")),
     db: AsyncSession = Depends(get_db)
 ):
     """Place a building on the clan base grid"""
-    user = _get_user(init_data)
-    membership = await _get_clan_membership(user["id"], db)
-
-    if membership.role not in ("leader", "officer"):
-        raise HTTPException(status_code=403, detail="Строить могут только лидер и офицер")
-
-    # Get building type
-    result = await db.execute(
-        select(BuildingType).where(BuildingType.code == building_type_code)
-    )
-    bt = result.scalar_one_or_none()
-    if not bt:
-        raise HTTPException(status_code=404, detail="Тип здания не найден")
-
     # Get clan
     result = await db.execute(select(Clan).where(Clan.id == membership.clan_id))
     clan = result.scalar_one_or_none()
@@ -160,45 +159,31 @@ async def place_building(
     if clan.metal < bt.cost_metal or clan.wood < bt.cost_wood or clan.food < bt.cost_food:
         raise HTTPException(status_code=400, detail="Недостаточно ресурсов")
 
-    # Get existing buildings for grid check
-    result = await db.execute(
-        select(Building)
-        .options(selectinload(Building.building_type))
-        .where(Building.clan_id == clan.id)
-    )
-    existing = []
-    for b in result.scalars().all():
-        existing.append({
-            "id": b.id,
-            "grid_x": b.grid_x,
-            "grid_y": b.grid_y,
-            "width": b.building_type.width,
-            "height": b.building_type.height,
-        })
-
-    grid = build_grid_from_buildings(existing)
-
-    if not can_place_building(grid, grid_x, grid_y, bt.width, bt.height):
-        raise HTTPException(status_code=400, detail="Нельзя поставить — место занято или за пределами базы")
+    async with clan_grid_lock(clan.id):
+        occupancy = await _get_clan_occupancy(clan.id, db)
+        if not can_place_mask(occupancy, grid_x, grid_y, bt.width, bt.height):
+            raise HTTPException(status_code=400, detail="Нельзя поставить — место занято или за пределами базы")
 
-    # Deduct resources
-    clan.metal -= bt.cost_metal
-    clan.wood -= bt.cost_wood
-    clan.food -= bt.cost_food
+        # Deduct resources
+        clan.metal -= bt.cost_metal
+        clan.wood -= bt.cost_wood
+        clan.food -= bt.cost_food
 
-    # Create building
-    now = datetime.utcnow()
-    building = Building(
-        clan_id=clan.id,
-        building_type_id=bt.id,
-        grid_x=grid_x,
-        grid_y=grid_y,
-        hp=bt.max_hp,
-        build_started=now,
-        build_complete=now + timedelta(seconds=bt.build_time),
-    )
-    db.add(building)
-    await db.commit()
+        # Create building
+        now = datetime.utcnow()
+        building = Building(
+            clan_id=clan.id,
+            building_type_id=bt.id,
+            grid_x=grid_x,
+            grid_y=grid_y,
+            hp=bt.max_hp,
+            build_started=now,
+            build_complete=now + timedelta(seconds=bt.build_time),
+        )
+        db.add(building)
+        await db.commit()
+        patch_cached_occupancy(clan.id, add=cells_mask(grid_x, grid_y, bt.width, bt.height))
+    await invalidate_clan_cache_by_id(db, clan.id)
 
     # Refresh buildings in the live world engine so they appear immediately
     await world_engine.refresh_buildings_for_base(clan.base_x, clan.base_y)
@@ -209,16 +194,16 @@ async def place_building(
 @router.post("/collect")
 async def collect_production(
     building_id: int,
-    init_data: str = Query(...),
+    membership=Depends(_require_role()),
     db: AsyncSession = Depends(get_db)
 ):
     """Collect resources from a production building"""
-    user = _get_user(init_data)
-    membership = await _get_clan_membership(user["id"], db)
 
+    # Lock the building row to prevent double-collection; the clan row is
+    # only touched by the atomic UPDATE below
     result = await db.execute(
         select(Building)
-        .options(selectinload(Building.building_type))
+        .options(raiseload("*"))
         .where(Building.id == building_id, Building.clan_id == membership.clan_id)
         .with_for_update()
     )
@@ -226,71 +211,74 @@ async def collect_production(
     if not building:
         raise HTTPException(status_code=404, detail="Здание не найдено")
 
-    bt = building.building_type
+    bt = get_building_type_by_id(building.building_type_id)
     if not bt.produces_resource or bt.production_rate <= 0:
         raise HTTPException(status_code=400, detail="Это не производственное здание")
 
     # Check if built
-    if building.build_complete and building.build_complete > datetime.utcnow():
+    now = datetime.utcnow()
+    if building.build_complete and building.build_complete > now:
         raise HTTPException(status_code=400, detail="Ещё строится")
 
     # Calculate produced (capped at storage)
     from .production import calculate_production
     prod = calculate_production(building.last_collected, bt.production_rate,
-                                getattr(bt, 'storage_capacity', 0))
+                                bt.storage_capacity, now)
     produced = prod["produced"]
 
     if produced <= 0:
         raise HTTPException(status_code=400, detail="Пока нечего собирать")
 
-    # Add to clan
-    result = await db.execute(select(Clan).where(Clan.id == membership.clan_id))
-    clan = result.scalar_one_or_none()
-
+    # Add to clan in SQL
     resource = bt.produces_resource
-    current = getattr(clan, resource, 0)
-    setattr(clan, resource, current + produced)
+    column = _CLAN_RESOURCE_COLUMNS[resource]
+    result = await db.execute(
+        update(Clan)
+        .where(Clan.id == membership.clan_id)
+        .values({column: column + produced})
+        .returning(column)
+    )
+    clan_total = result.scalar_one()
 
-    building.last_collected = datetime.utcnow()
+    building.last_collected = now
     await db.commit()
+    await invalidate_clan_cache_by_id(db, membership.clan_id)
 
     return {
         "success": True,
         "resource": resource,
         "amount": produced,
-        "clan_total": getattr(clan, resource),
+        "clan_total": clan_total,
     }
 
 
 @router.delete("/{building_id}")
 async def demolish_building(
     building_id: int,
-    init_data: str = Query(...),
+    membership=Depends(_require_role("leader", "officer", detail="Нет прав (нужен лидер или офицер)")),
     db: AsyncSession = Depends(get_db)
 ):
     """Demolish a building (leader/officer only)"""
-    user = _get_user(init_data)
-    membership = await _get_clan_membership(user["id"], db)
-
-    if membership.role not in ("leader", "officer"):
-        raise HTTPException(status_code=403, detail="Нет прав (нужен лидер или офицер)")
-
-    result = await db.execute(
-        select(Building).where(
-            Building.id == building_id,
-            Building.clan_id == membership.clan_id
-        )
-    )
-    building = result.scalar_one_or_none()
-    if not building:
-        raise HTTPException(status_code=404, detail="Здание не найдено")
-
     # Get clan for base position before deleting
     result = await db.execute(select(Clan).where(Clan.id == membership.clan_id))
     clan = result.scalar_one_or_none()
 
-    await db.delete(building)
-    await db.commit()
+    async with clan_grid_lock(membership.clan_id):
+        # Read the row under the lock so the freed cells match a concurrent move
+        result = await db.execute(
+            select(Building).where(
+                Building.id == building_id,
+                Building.clan_id == membership.clan_id
+            ).with_for_update()
+        )
+        building = result.scalar_one_or_none()
+        if not building:
+            raise HTTPException(status_code=404, detail="Здание не найдено")
+
+        await db.delete(building)
+        await db.commit()
+        patch_cached_occupancy(membership.clan_id, remove=_building_mask(building))
+    await invalidate_clan_cache_by_id(db, membership.clan_id)
 
     # Refresh buildings in the live world engine
     if clan:
@@ -304,50 +292,33 @@ async def move_building(
     building_id: int,
     grid_x: int,
     grid_y: int,
-    init_data: str = Query(...),
+    membership=Depends(_require_role("leader", "officer", detail="Нет прав (нужен лидер или офицер)")),
     db: AsyncSession = Depends(get_db)
 ):
     """Move a building to a new grid position (leader/officer only)"""
-    user = _get_user(init_data)
-    membership = await _get_clan_membership(user["id"], db)
-
-    if membership.role not in ("leader", "officer"):
-        raise HTTPException(status_code=403, detail="Нет прав (нужен лидер или офицер)")
-
-    result = await db.execute(
-        select(Building)
-        .options(selectinload(Building.building_type))
-        .where(Building.id == building_id, Building.clan_id == membership.clan_id)
-    )
-    building = result.scalar_one_or_none()
-    if not building:
-        raise HTTPException(status_code=404, detail="Здание не найдено")
+    async with clan_grid_lock(membership.clan_id):
+        # Read the row under the lock so old_mask matches its committed position
+        result = await db.execute(
+            select(Building)
+            .where(Building.id == building_id, Building.clan_id == membership.clan_id)
+            .with_for_update()
+        )
+        building = result.scalar_one_or_none()
+        if not building:
+            raise HTTPException(status_code=404, detail="Здание не найдено")
 
-    bt = building.building_type
+        bt = get_building_type_by_id(building.building_type_id)
 
-    # Get all other buildings for collision check
-    result = await db.execute(
-        select(Building)
-        .options(selectinload(Building.building_type))
-        .where(Building.clan_id == membership.clan_id, Building.id != building_id)
-    )
-    existing = []
-    for b in result.scalars().all():
-        existing.append({
-            "id": b.id,
-            "grid_x": b.grid_x,
-            "grid_y": b.grid_y,
-            "width": b.building_type.width,
-            "height": b.building_type.height,
-        })
-
-    grid = build_grid_from_buildings(existing)
-    if not can_place_building(grid, grid_x, grid_y, bt.width, bt.height):
-        raise HTTPException(status_code=400, detail="Нельзя поставить — место занято или за пределами базы")
+        # Collision check against every other building
+        old_mask = _building_mask(building)
+        occupancy = await _get_clan_occupancy(membership.clan_id, db) & ~old_mask
+        if not can_place_mask(occupancy, grid_x, grid_y, bt.width, bt.height):
+            raise HTTPException(status_code=400, detail="Нельзя поставить — место занято или за пределами базы")
 
-    building.grid_x = grid_x
-    building.grid_y = grid_y
-    await db.commit()
+        building.grid_x = grid_x
+        building.grid_y = grid_y
+        await db.commit()
+        patch_cached_occupancy(membership.clan_id, add=_building_mask(building), remove=old_mask)
 
     # Refresh world engine
     result = await db.execute(select(Clan).where(Clan.id == membership.clan_id))
@@ -366,16 +337,16 @@ async def _collect_building_from_world(player_id: int, building_id: int, world_p
     async with _async_session() as db:
         # Verify player is in a clan
         result = await db.execute(
-            select(ClanMember).where(ClanMember.player_id == player_id)
+            select(ClanMember.clan_id, ClanMember.role).where(ClanMember.player_id == player_id)
         )
-        membership = result.scalar_one_or_none()
+        membership = result.one_or_none()
         if not membership:
             return {"success": False, "reason": "not_in_clan"}
 
-        # Get the building with row lock to prevent double-collection
+        # Get the building (and its clan) with row lock to prevent double-collection
         result = await db.execute(
             select(Building)
-            .options(selectinload(Building.building_type))
+            .options(joinedload(Building.clan, innerjoin=True), raiseload("*"))
             .where(Building.id == building_id, Building.clan_id == membership.clan_id)
             .with_for_update()
         )
@@ -383,17 +354,18 @@ async def _collect_building_from_world(player_id: int, building_id: int, world_p
         if not building:
             return {"success": False, "reason": "not_found"}
 
-        bt = building.building_type
+        bt = get_building_type_by_id(building.building_type_id)
         if not bt.produces_resource or bt.production_rate <= 0:
             return {"success": False, "reason": "not_production"}
 
         # Check if built
-        if building.build_complete and building.build_complete > datetime.utcnow():
+        now = datetime.utcnow()
+        if building.build_complete and building.build_complete > now:
             return {"success": False, "reason": "not_built"}
 
         # Calculate produced (capped at storage)
         prod = calculate_production(building.last_collected, bt.production_rate,
-                                    getattr(bt, 'storage_capacity', 0))
+                                    bt.storage_capacity, now)
         produced = prod["produced"]
         if produced <= 0:
             return {"success": False, "reason": "nothing_ready"}
@@ -402,14 +374,12 @@ async def _collect_building_from_world(player_id: int, building_id: int, world_p
         resource = bt.produces_resource
         world_player.collect_resource(resource, produced)
 
-        building.last_collected = datetime.utcnow()
+        building.last_collected = now
         await db.commit()
 
         # Refresh buildings so all clients see updated last_collected_ts
-        result2 = await db.execute(select(Clan).where(Clan.id == membership.clan_id))
-        clan = result2.scalar_one_or_none()
-        if clan:
-            await world_engine.refresh_buildings_for_base(clan.base_x, clan.base_y)
+        clan = building.clan
+        await world_engine.refresh_buildings_for_base(clan.base_x, clan.base_y)
 
         return {
             "success": True,
@@ -426,16 +396,15 @@ async def _collect_all_buildings_from_world(player_id: int, world_player) -> dic
 
     async with _async_session() as db:
         result = await db.execute(
-            select(ClanMember).where(ClanMember.player_id == player_id)
+            select(ClanMember.clan_id, ClanMember.role).where(ClanMember.player_id == player_id)
         )
-        membership = result.scalar_one_or_none()
+        membership = result.one_or_none()
         if not membership:
             return {"success": False, "reason": "not_in_clan"}
 
         # Lock all buildings for this clan
         result = await db.execute(
             select(Building)
-            .options(selectinload(Building.building_type))
             .where(Building.clan_id == membership.clan_id)
             .with_for_update()
         )
@@ -445,14 +414,14 @@ async def _collect_all_buildings_from_world(player_id: int, world_player) -> dic
         buildings_collected = 0
 
         for building in result.scalars().all():
-            bt = building.building_type
+            bt = get_building_type_by_id(building.building_type_id)
             if not bt.produces_resource or bt.production_rate <= 0:
                 continue
             if building.build_complete and building.build_complete > now:
                 continue
 
             prod = calculate_production(building.last_collected, bt.production_rate,
-                                        getattr(bt, 'storage_capacity', 0))
+                                        bt.storage_capacity, now)
             if prod["produced"] <= 0:
                 continue
 
@@ -488,47 +457,35 @@ async def _move_building_from_world(player_id: int, building_id: int,
 
     async with _async_session() as db:
         result = await db.execute(
-            select(ClanMember).where(ClanMember.player_id == player_id)
+            select(ClanMember.clan_id, ClanMember.role).where(ClanMember.player_id == player_id)
         )
-        membership = result.scalar_one_or_none()
+        membership = result.one_or_none()
         if not membership or membership.role not in ("leader", "officer"):
             return {"success": False, "reason": "not_authorized"}
 
-        # Get the building
-        result = await db.execute(
-            select(Building)
-            .options(selectinload(Building.building_type))
-            .where(Building.id == building_id, Building.clan_id == membership.clan_id)
-        )
-        building = result.scalar_one_or_none()
-        if not building:
-            return {"success": False, "reason": "not_found"}
+        async with clan_grid_lock(membership.clan_id):
+            # Read the row under the lock so old_mask matches its committed position
+            result = await db.execute(
+                select(Building)
+                .where(Building.id == building_id, Building.clan_id == membership.clan_id)
+                .with_for_update()
+            )
+            building = result.scalar_one_or_none()
+            if not building:
+                return {"success": False, "reason": "not_found"}
 
-        bt = building.building_type
+            bt = get_building_type_by_id(building.building_type_id)
 
-        # Get all other buildings for collision check
-        result = await db.execute(
-            select(Building)
-            .options(selectinload(Building.building_type))
-            .where(Building.clan_id == membership.clan_id, Building.id != building_id)
-        )
-        existing = []
-        for b in result.scalars().all():
-            existing.append({
-                "id": b.id,
-                "grid_x": b.grid_x,
-                "grid_y": b.grid_y,
-                "width": b.building_type.width,
-                "height": b.building_type.height,
-            })
-
-        grid = build_grid_from_buildings(existing)
-        if not can_place_building(grid, new_grid_x, new_grid_y, bt.width, bt.height):
-            return {"success": False, "reason": "cannot_place"}
-
-        building.grid_x = new_grid_x
-        building.grid_y = new_grid_y
-        await db.commit()
+            # Collision check against every other building
+            old_mask = _building_mask(building)
+            occupancy = await _get_clan_occupancy(membership.clan_id, db) & ~old_mask
+            if not can_place_mask(occupancy, new_grid_x, new_grid_y, bt.width, bt.height):
+                return {"success": False, "reason": "cannot_place"}
+
+            building.grid_x = new_grid_x
+            building.grid_y = new_grid_y
+            await db.commit()
+            patch_cached_occupancy(membership.clan_id, add=_building_mask(building), remove=old_mask)
 
         # Refresh world engine
         result = await db.execute(select(Clan).where(Clan.id == membership.clan_id))
@@ -545,27 +502,31 @@ async def _demolish_building_from_world(player_id: int, building_id: int) -> dic
 
     async with _async_session() as db:
         result = await db.execute(
-            select(ClanMember).where(ClanMember.player_id == player_id)
+            select(ClanMember.clan_id, ClanMember.role).where(ClanMember.player_id == player_id)
         )
-        membership = result.scalar_one_or_none()
+        membership = result.one_or_none()
         if not membership or membership.role not in ("leader", "officer"):
             return {"success": False, "reason": "not_authorized"}
 
-        result = await db.execute(
-            select(Building).where(
-                Building.id == building_id,
-                Building.clan_id == membership.clan_id
-            )
-        )
-        building = result.scalar_one_or_none()
-        if not building:
-            return {"success": False, "reason": "not_found"}
-
         result = await db.execute(select(Clan).where(Clan.id == membership.clan_id))
         clan = result.scalar_one_or_none()
 
-        await db.delete(building)
-        await db.commit()
+        async with clan_grid_lock(membership.clan_id):
+            # Read the row under the lock so the freed cells match a concurrent move
+            result = await db.execute(
+                select(Building).where(
+                    Building.id == building_id,
+                    Building.clan_id == membership.clan_id
+                ).with_for_update()
+            )
+            building = result.scalar_one_or_none()
+            if not building:
+                return {"success": False, "reason": "not_found"}
+
+            await db.delete(building)
+            await db.commit()
+            patch_cached_occupancy(membership.clan_id, remove=_building_mask(building))
+        await invalidate_clan_cache_by_id(db, membership.clan_id)
 
         if clan:
             await world_engine.refresh_buildings_for_base(clan.base_x, clan.base_y)
@@ -1,171 +1,305 @@
 """
 Типы зданий для базы клана
 """
+import hashlib
+from dataclasses import dataclass, asdict, fields
+from typing import Dict, Optional, Tuple
+
+import orjson
 from sqlalchemy import select
 
-BUILDING_TYPES = [
+
+@dataclass(frozen=True, slots=True)
+class BuildingTypeSpec:
+    """Описание типа здания для сида; значения по умолчанию совпадают с колонками BuildingType"""
+    code: str
+    name: str
+    category: str
+    width: int = 1
+    height: int = 1
+    max_hp: int = 100
+    produces_resource: Optional[str] = None
+    production_rate: float = 0
+    storage_capacity: int = 0
+    damage: int = 0
+    fire_rate: float = 0
+    attack_range: float = 0
+    cost_metal: int = 0
+    cost_wood: int = 0
+    cost_food: int = 0
+    build_time: int = 60
+
+
+BUILDING_TYPES: Tuple[BuildingTypeSpec, ...] = (
     # Защитные
-    {
-        "code": "wall_wood",
-        "name": "Деревянная стена",
-        "category": "defense",
-        "width": 1, "height": 1,
-        "max_hp": 100,
-        "cost_wood": 20,
-        "build_time": 30
-    },
-    {
-        "code": "wall_metal",
-        "name": "Металлическая стена",
-        "category": "defense",
-        "width": 1, "height": 1,
-        "max_hp": 300,
-        "cost_metal": 30, "cost_wood": 10,
-        "build_time": 60
-    },
-    {
-        "code": "turret_basic",
-        "name": "Базовая турель",
-        "category": "defense",
-        "width": 1, "height": 1,
-        "max_hp": 150,
-        "damage": 10, "fire_rate": 2.0, "attack_range": 300,
-        "cost_metal": 50, "cost_wood": 20,
-        "build_time": 120
-    },
-    {
-        "code": "turret_heavy",
-        "name": "Тяжёлая турель",
-        "category": "defense",
-        "width": 2, "height": 2,
-        "max_hp": 300,
-        "damage": 25, "fire_rate": 1.0, "attack_range": 400,
-        "cost_metal": 150, "cost_wood": 50,
-        "build_time": 300
-    },
-
-    {
-        "code": "gate_wood",
-        "name": "Деревянные ворота",
-        "category": "defense",
-        "width": 1, "height": 1,
-        "max_hp": 80,
-        "cost_wood": 30,
-        "build_time": 45
-    },
-    {
-        "code": "gate_metal",
-        "name": "Металлические ворота",
-        "category": "defense",
-        "width": 1, "height": 1,
-        "max_hp": 250,
-        "cost_metal": 40, "cost_wood": 15,
-        "build_time": 90
-    },
+    BuildingTypeSpec(
+        code="wall_wood",
+        name="Деревянная стена",
+        category="defense",
+        width=1, height=1,
+        max_hp=100,
+        cost_wood=20,
+        build_time=30,
+    ),
+    BuildingTypeSpec(
+        code="wall_metal",
+        name="Металлическая стена",
+        category="defense",
+        width=1, height=1,
+        max_hp=300,
+        cost_metal=30, cost_wood=10,
+        build_time=60,
+    ),
+    BuildingTypeSpec(
+        code="turret_basic",
+        name="Базовая турель",
+        category="defense",
+        width=1, height=1,
+        max_hp=150,
+        damage=10, fire_rate=2.0, attack_range=300,
+        cost_metal=50, cost_wood=20,
+        build_time=120,
+    ),
+    BuildingTypeSpec(
+        code="turret_heavy",
+        name="Тяжёлая турель",
+        category="defense",
+        width=2, height=2,
+        max_hp=300,
+        damage=25, fire_rate=1.0, attack_range=400,
+        cost_metal=150, cost_wood=50,
+        build_time=300,
+    ),
+
+    BuildingTypeSpec(
+        code="gate_wood",
+        name="Деревянные ворота",
+        category="defense",
+        width=1, height=1,
+        max_hp=80,
+        cost_wood=30,
+        build_time=45,
+    ),
+    BuildingTypeSpec(
+        code="gate_metal",
+        name="Металлические ворота",
+        category="defense",
+        width=1, height=1,
+        max_hp=250,
+        cost_metal=40, cost_wood=15,
+        build_time=90,
+    ),
 
     # Производство
-    {
-        "code": "mine",
-        "name": "Шахта",
-        "category": "production",
-        "width": 2, "height": 2,
-        "max_hp": 200,
-        "produces_resource": "metal", "production_rate": 10,  # per hour
-        "storage_capacity": 100,
-        "cost_metal": 30, "cost_wood": 50,
-        "build_time": 180
-    },
-    {
-        "code": "sawmill",
-        "name": "Лесопилка",
-        "category": "production",
-        "width": 2, "height": 2,
-        "max_hp": 150,
-        "produces_resource": "wood", "production_rate": 15,
-        "storage_capacity": 150,
-        "cost_metal": 20, "cost_wood": 30,
-        "build_time": 120
-    },
-    {
-        "code": "farm",
-        "name": "Ферма",
-        "category": "production",
-        "width": 3, "height": 2,
-        "max_hp": 100,
-        "produces_resource": "food", "production_rate": 8,
-        "storage_capacity": 80,
-        "cost_wood": 40,
-        "build_time": 150
-    },
-    {
-        "code": "ammo_factory",
-        "name": "Оружейная",
-        "category": "production",
-        "width": 2, "height": 2,
-        "max_hp": 200,
-        "produces_resource": "ammo", "production_rate": 5,
-        "storage_capacity": 50,
-        "cost_metal": 80, "cost_wood": 30,
-        "build_time": 240
-    },
-    {
-        "code": "med_station",
-        "name": "Медпункт",
-        "category": "production",
-        "width": 2, "height": 2,
-        "max_hp": 150,
-        "produces_resource": "meds", "production_rate": 2,
-        "storage_capacity": 20,
-        "cost_metal": 40, "cost_food": 20,
-        "build_time": 200
-    },
+    BuildingTypeSpec(
+        code="mine",
+        name="Шахта",
+        category="production",
+        width=2, height=2,
+        max_hp=200,
+        produces_resource="metal", production_rate=10,  # per hour
+        storage_capacity=100,
+        cost_metal=30, cost_wood=50,
+        build_time=180,
+    ),
+    BuildingTypeSpec(
+        code="sawmill",
+        name="Лесопилка",
+        category="production",
+        width=2, height=2,
+        max_hp=150,
+        produces_resource="wood", production_rate=15,
+        storage_capacity=150,
+        cost_metal=20, cost_wood=30,
+        build_time=120,
+    ),
+    BuildingTypeSpec(
+        code="farm",
+        name="Ферма",
+        category="production",
+        width=3, height=2,
+        max_hp=100,
+        produces_resource="food", production_rate=8,
+        storage_capacity=80,
+        cost_wood=40,
+        build_time=150,
+    ),
+    BuildingTypeSpec(
+        code="ammo_factory",
+        name="Оружейная",
+        category="production",
+        width=2, height=2,
+        max_hp=200,
+        produces_resource="ammo", production_rate=5,
+        storage_capacity=50,
+        cost_metal=80, cost_wood=30,
+        build_time=240,
+    ),
+    BuildingTypeSpec(
+        code="med_station",
+        name="Медпункт",
+        category="production",
+        width=2, height=2,
+        max_hp=150,
+        produces_resource="meds", production_rate=2,
+        storage_capacity=20,
+        cost_metal=40, cost_food=20,
+        build_time=200,
+    ),
 
     # Утилиты
-    {
-        "code": "bunker",
-        "name": "Бункер",
-        "category": "utility",
-        "width": 3, "height": 3,
-        "max_hp": 500,
-        "cost_metal": 200, "cost_wood": 100,
-        "build_time": 600
-    },
-    {
-        "code": "barracks",
-        "name": "Казарма",
-        "category": "utility",
-        "width": 2, "height": 2,
-        "max_hp": 200,
-        "cost_metal": 60, "cost_wood": 40, "cost_food": 30,
-        "build_time": 300
-    },
-    {
-        "code": "arena",
-        "name": "Арена",
-        "category": "utility",
-        "width": 4, "height": 4,
-        "max_hp": 300,
-        "cost_metal": 100, "cost_wood": 100,
-        "build_time": 400
-    },
-]
+    BuildingTypeSpec(
+        code="bunker",
+        name="Бункер",
+        category="utility",
+        width=3, height=3,
+        max_hp=500,
+        cost_metal=200, cost_wood=100,
+        build_time=600,
+    ),
+    BuildingTypeSpec(
+        code="barracks",
+        name="Казарма",
+        category="utility",
+        width=2, height=2,
+        max_hp=200,
+        cost_metal=60, cost_wood=40, cost_food=30,
+        build_time=300,
+    ),
+    BuildingTypeSpec(
+        code="arena",
+        name="Арена",
+        category="utility",
+        width=4, height=4,
+        max_hp=300,
+        cost_metal=100, cost_wood=100,
+        build_time=400,
+    ),
+)
 
 
-async def seed_building_types(db):
-    """Заполнить таблицу типов зданий (insert new, update existing)"""
+@dataclass(frozen=True, slots=True)
+class BuildingTypeInfo:
+    """Строка building_types, закэшированная в памяти процесса"""
+    id: int
+    code: str
+    name: str
+    category: str
+    width: int
+    height: int
+    max_hp: int
+    produces_resource: Optional[str]
+    production_rate: float
+    storage_capacity: int
+    damage: int
+    fire_rate: float
+    attack_range: float
+    cost_metal: int
+    cost_wood: int
+    cost_food: int
+    build_time: int
+
+
+# Справочник статичен — грузим один раз при сиде и не ходим за ним в БД на каждый запрос
+_bt_by_code: Dict[str, BuildingTypeInfo] = {}
+_bt_by_id: Dict[int, BuildingTypeInfo] = {}
+# Готовый JSON для /api/buildings/types и его ETag
+_types_json: bytes = b"[]"
+_types_etag: str = '""'
+
+
+def get_building_type(code: str) -> Optional[BuildingTypeInfo]:
+    """Тип здания по коду (из кэша)"""
+    return _bt_by_code.get(code)
+
+
+def get_building_type_by_id(type_id: int) -> Optional[BuildingTypeInfo]:
+    """Тип здания по id (из кэша)"""
+    return _bt_by_id.get(type_id)
+
+
+def get_building_types_json() -> Tuple[bytes, str]:
+    """Сериализованный список типов зданий и его ETag"""
+    return _types_json, _types_etag
+
+
+def _public_type_dict(bt: BuildingTypeInfo) -> dict:
+    """Поля типа здания, которые отдаёт /types"""
+    return {
+        "id": bt.id,
+        "code": bt.code,
+        "name": bt.name,
+        "category": bt.category,
+        "width": bt.width,
+        "height": bt.height,
+        "max_hp": bt.max_hp,
+        "produces_resource": bt.produces_resource,
+        "production_rate": bt.production_rate,
+        "damage": bt.damage,
+        "fire_rate": bt.fire_rate,
+        "attack_range": bt.attack_range,
+        "cost_metal": bt.cost_metal,
+        "cost_wood": bt.cost_wood,
+        "cost_food": bt.cost_food,
+        "build_time": bt.build_time,
+    }
+
+
+async def load_building_types_cache(db):
+    """Перечитать таблицу типов зданий в кэш"""
     from ...models import BuildingType
 
-    for bt_data in BUILDING_TYPES:
-        result = await db.execute(
-            select(BuildingType).where(BuildingType.code == bt_data["code"])
+    result = await db.execute(select(BuildingType).order_by(BuildingType.id))
+    by_code = {}
+    by_id = {}
+    for row in result.scalars().all():
+        info = BuildingTypeInfo(
+            id=row.id,
+            code=row.code,
+            name=row.name,
+            category=row.category,
+            width=row.width,
+            height=row.height,
+            max_hp=row.max_hp,
+            produces_resource=row.produces_resource,
+            production_rate=row.production_rate,
+            storage_capacity=row.storage_capacity or 0,
+            damage=row.damage,
+            fire_rate=row.fire_rate,
+            attack_range=row.attack_range,
+            cost_metal=row.cost_metal,
+            cost_wood=row.cost_wood,
+            cost_food=row.cost_food,
+            build_time=row.build_time,
         )
-        row = result.scalar_one_or_none()
-        if row is None:
-            bt = BuildingType(**bt_data)
-            db.add(bt)
-        else:
-            for key, value in bt_data.items():
-                if hasattr(row, key):
-                    setattr(row, key, value)
+        by_code[info.code] = info
+        by_id[info.id] = info
+
+    _bt_by_code.clear()
+    _bt_by_code.update(by_code)
+    _bt_by_id.clear()
+    _bt_by_id.update(by_id)
+
+    global _types_json, _types_etag
+    _types_json = orjson.dumps([_public_type_dict(bt) for bt in by_id.values()])
+    _types_etag = '"' + hashlib.sha1(_types_json).hexdigest() + '"'
+    print(f"[BuildingTypes] Cached {len(by_id)} building types")
+
+
+async def seed_building_types(db):
+    """Заполнить таблицу типов зданий (insert new, update existing) одним запросом"""
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from ...models import BuildingType
+
+    # Every spec carries all columns, so the multi-VALUES rows are uniform
+    rows = [asdict(spec) for spec in BUILDING_TYPES]
+    keys = [f.name for f in fields(BuildingTypeSpec)]
 
+    stmt = pg_insert(BuildingType).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[BuildingType.code],
+        set_={key: stmt.excluded[key] for key in keys if key != "code"},
+    )
+    await db.execute(stmt)
     await db.commit()
+    await load_building_types_cache(db)
@@ -1,62 +1,80 @@
 """
 Clan REST API routes.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+from functools import partial
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import case, delete, exists, select, update
 
 from ...database import get_db
 from ...models import Clan, ClanMember, Player, PlayerInventory
-from ...auth import validate_telegram_data
+from .clan_service import invalidate_clan_cache_by_id
+from .deps import current_user, require_role
 
 router = APIRouter(prefix="/api/clan", tags=["clan"])
 
+_require_role = partial(require_role, not_member_detail="Not in a clan")
+
 
-def _get_user(init_data: str) -> dict:
-    user = validate_telegram_data(init_data)
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid auth")
-    return user
+def _clan_roster(clan_filter):
+    """Clan columns joined to one row per member and its username, in one query.
+
+    Clan columns repeat on every row; a clan without members yields one row
+    with NULL member columns.
+    """
+    return (
+        select(
+            Clan.id, Clan.name, Clan.telegram_chat_id,
+            Clan.metal, Clan.wood, Clan.food, Clan.ammo, Clan.meds,
+            Clan.base_x, Clan.base_y,
+            ClanMember.player_id, ClanMember.role, ClanMember.joined_at,
+            Player.username,
+        )
+        .outerjoin(ClanMember, ClanMember.clan_id == Clan.id)
+        .outerjoin(Player, Player.telegram_id == ClanMember.player_id)
+        .where(clan_filter)
+    )
 
 
 @router.get("")
 async def get_my_clan(
-    init_data: str = Query(...),
+    user: dict = Depends(current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get player's clan info"""
-    user = _get_user(init_data)
     telegram_id = user["id"]
 
-    result = await db.execute(
-        select(ClanMember)
-        .options(selectinload(ClanMember.clan))
+    # Clan, members and their usernames in one query by the player's membership
+    result = await db.execute(_clan_roster(Clan.id == (
+        select(ClanMember.clan_id)
         .where(ClanMember.player_id == telegram_id)
-    )
-    membership = result.scalar_one_or_none()
+        .scalar_subquery()
+    )))
+    rows = result.all()
 
-    if not membership:
-        return {"clan": None}
+    if not rows:
+        return ORJSONResponse({"clan": None})
 
-    clan = membership.clan
-
-    # Get members
-    result = await db.execute(
-        select(ClanMember)
-        .options(selectinload(ClanMember.player))
-        .where(ClanMember.clan_id == clan.id)
-    )
+    clan = rows[0]
     members = []
-    for m in result.scalars().all():
+    my_role = None
+    for m in rows:
+        if m.player_id is None:
+            continue
+        if m.player_id == telegram_id:
+            my_role = m.role
         members.append({
             "player_id": m.player_id,
-            "username": m.player.username if m.player else None,
+            "username": m.username,
             "role": m.role,
-            "joined_at": m.joined_at.isoformat() if m.joined_at else None,
+            "joined_at": m.joined_at,  # orjson writes ISO 8601
         })
 
-    return {
+    # Returning a Response skips FastAPI's jsonable_encoder walk
+    return ORJSONResponse({
         "clan": {
             "id": clan.id,
             "name": clan.name,
@@ -72,38 +90,31 @@ async def get_my_clan(
             "base_y": clan.base_y,
             "members": members,
         },
-        "my_role": membership.role,
-    }
+        "my_role": my_role,
+    })
 
 
 @router.post("/create")
 async def create_clan(
     name: str,
     telegram_chat_id: int,
-    init_data: str = Query(...),
+    user: dict = Depends(current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Create a new clan linked to a Telegram group"""
-    user = _get_user(init_data)
     telegram_id = user["id"]
 
     # Check not already in a clan
-    result = await db.execute(
-        select(ClanMember).where(ClanMember.player_id == telegram_id)
-    )
-    if result.scalar_one_or_none():
+    if await db.scalar(select(exists().where(ClanMember.player_id == telegram_id))):
         raise HTTPException(status_code=400, detail="Already in a clan")
 
     # Check chat ID not taken
-    result = await db.execute(
-        select(Clan).where(Clan.telegram_chat_id == telegram_chat_id)
-    )
-    if result.scalar_one_or_none():
+    if await db.scalar(select(exists().where(Clan.telegram_chat_id == telegram_chat_id))):
         raise HTTPException(status_code=400, detail="Chat already linked to a clan")
 
     # Find base location
     from .map_generator import map_generator
-    base_cx, base_cy = map_generator.find_base_location()
+    base_cx, base_cy = await asyncio.to_thread(map_generator.find_base_location)
     from .map_generator import CHUNK_SIZE
     base_x = base_cx * CHUNK_SIZE + CHUNK_SIZE // 2
     base_y = base_cy * CHUNK_SIZE + CHUNK_SIZE // 2
@@ -125,6 +136,8 @@ async def create_clan(
     )
     db.add(member)
     await db.commit()
+    # Drops the bot's cached "no clan" answer for this chat
+    await invalidate_clan_cache_by_id(db, clan.id)
 
     return {"success": True, "clan_id": clan.id, "name": clan.name}
 
@@ -132,24 +145,19 @@ async def create_clan(
 @router.post("/join")
 async def join_clan(
     clan_id: int,
-    init_data: str = Query(...),
+    user: dict = Depends(current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Join an existing clan"""
-    user = _get_user(init_data)
     telegram_id = user["id"]
 
     # Check not already in a clan
-    result = await db.execute(
-        select(ClanMember).where(ClanMember.player_id == telegram_id)
-    )
-    if result.scalar_one_or_none():
+    if await db.scalar(select(exists().where(ClanMember.player_id == telegram_id))):
         raise HTTPException(status_code=400, detail="Already in a clan")
 
     # Check clan exists
-    result = await db.execute(select(Clan).where(Clan.id == clan_id))
-    clan = result.scalar_one_or_none()
-    if not clan:
+    clan_name = await db.scalar(select(Clan.name).where(Clan.id == clan_id))
+    if clan_name is None:
         raise HTTPException(status_code=404, detail="Clan not found")
 
     member = ClanMember(
@@ -159,74 +167,66 @@ async def join_clan(
     )
     db.add(member)
     await db.commit()
+    await invalidate_clan_cache_by_id(db, clan_id)
 
-    return {"success": True, "clan_name": clan.name}
+    return {"success": True, "clan_name": clan_name}
 
 
 @router.delete("/leave")
 async def leave_clan(
-    init_data: str = Query(...),
+    user: dict = Depends(current_user),
+    membership=Depends(_require_role()),
     db: AsyncSession = Depends(get_db)
 ):
     """Leave current clan"""
-    user = _get_user(init_data)
     telegram_id = user["id"]
 
-    result = await db.execute(
-        select(ClanMember).where(ClanMember.player_id == telegram_id)
-    )
-    membership = result.scalar_one_or_none()
-    if not membership:
-        raise HTTPException(status_code=400, detail="Not in a clan")
-
     if membership.role == "leader":
-        # Check if there are other members
-        result = await db.execute(
-            select(ClanMember).where(
+        # Promote first officer (or else first member) to leader in SQL;
+        # a no-op when nobody else is in the clan
+        successor = (
+            select(ClanMember.id)
+            .where(
                 ClanMember.clan_id == membership.clan_id,
-                ClanMember.player_id != telegram_id
+                ClanMember.player_id != telegram_id,
             )
+            .order_by(case((ClanMember.role == "officer", 0), else_=1), ClanMember.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        await db.execute(
+            update(ClanMember).where(ClanMember.id == successor).values(role="leader")
         )
-        others = result.scalars().all()
-        if others:
-            # Promote first officer or member to leader
-            new_leader = next((m for m in others if m.role == "officer"), others[0])
-            new_leader.role = "leader"
 
-    await db.delete(membership)
+    await db.execute(delete(ClanMember).where(ClanMember.player_id == telegram_id))
     await db.commit()
+    await invalidate_clan_cache_by_id(db, membership.clan_id)
 
     return {"success": True}
 
 
-@router.get("/{clan_id}")
+@router.get("/{clan_id}", dependencies=[Depends(current_user)])
 async def get_clan_details(
     clan_id: int,
-    init_data: str = Query(...),
     db: AsyncSession = Depends(get_db)
 ):
     """Get details of a specific clan"""
-    _get_user(init_data)
-
-    result = await db.execute(select(Clan).where(Clan.id == clan_id))
-    clan = result.scalar_one_or_none()
-    if not clan:
+    result = await db.execute(_clan_roster(Clan.id == clan_id))
+    rows = result.all()
+    if not rows:
         raise HTTPException(status_code=404, detail="Clan not found")
 
-    result = await db.execute(
-        select(ClanMember)
-        .options(selectinload(ClanMember.player))
-        .where(ClanMember.clan_id == clan_id)
-    )
-    members = []
-    for m in result.scalars().all():
-        members.append({
+    clan = rows[0]
+    members = [
+        {
             "player_id": m.player_id,
-            "username": m.player.username if m.player else None,
+            "username": m.username,
             "role": m.role,
-        })
+        }
+        for m in rows if m.player_id is not None
+    ]
 
-    return {
+    return ORJSONResponse({
         "id": clan.id,
         "name": clan.name,
         "resources": {
@@ -238,7 +238,7 @@ async def get_clan_details(
         },
         "members": members,
         "member_count": len(members),
-    }
+    })
 
 
 @router.post("/deposit")
@@ -248,53 +248,66 @@ async def deposit_resources(
     food: int = 0,
     ammo: int = 0,
     meds: int = 0,
-    init_data: str = Query(...),
+    user: dict = Depends(current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Deposit resources from player inventory to clan"""
-    user = _get_user(init_data)
     telegram_id = user["id"]
 
+    if metal < 0 or wood < 0 or food < 0 or ammo < 0 or meds < 0:
+        raise HTTPException(status_code=400, detail="Invalid amounts")
+
     # Get membership
     result = await db.execute(
-        select(ClanMember).where(ClanMember.player_id == telegram_id)
+        select(ClanMember.clan_id).where(ClanMember.player_id == telegram_id)
     )
-    membership = result.scalar_one_or_none()
-    if not membership:
-        raise HTTPException(status_code=400, detail="Not in a clan")
+    clan_id = result.scalar_one_or_none()
+    if clan_id is None:
+        raise HTTPException(status_code=403, detail="Not in a clan")
 
-    # Get player inventory
+    # Take from inventory only if every amount is covered
     result = await db.execute(
-        select(PlayerInventory).where(PlayerInventory.player_id == telegram_id)
+        update(PlayerInventory)
+        .where(
+            PlayerInventory.player_id == telegram_id,
+            PlayerInventory.metal >= metal,
+            PlayerInventory.wood >= wood,
+            PlayerInventory.food >= food,
+            PlayerInventory.ammo >= ammo,
+            PlayerInventory.meds >= meds,
+        )
+        .values(
+            metal=PlayerInventory.metal - metal,
+            wood=PlayerInventory.wood - wood,
+            food=PlayerInventory.food - food,
+            ammo=PlayerInventory.ammo - ammo,
+            meds=PlayerInventory.meds - meds,
+        )
+        .returning(PlayerInventory.player_id)
     )
-    inv = result.scalar_one_or_none()
-    if not inv:
-        raise HTTPException(status_code=400, detail="No inventory")
-
-    # Validate amounts
-    if metal > inv.metal or wood > inv.wood or food > inv.food or ammo > inv.ammo or meds > inv.meds:
+    if result.scalar_one_or_none() is None:
+        await db.rollback()
+        result = await db.execute(
+            select(PlayerInventory.player_id).where(PlayerInventory.player_id == telegram_id)
+        )
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=400, detail="No inventory")
         raise HTTPException(status_code=400, detail="Not enough resources")
 
-    if metal < 0 or wood < 0 or food < 0 or ammo < 0 or meds < 0:
-        raise HTTPException(status_code=400, detail="Invalid amounts")
-
     # Transfer
-    result = await db.execute(select(Clan).where(Clan.id == membership.clan_id))
-    clan = result.scalar_one_or_none()
-
-    inv.metal -= metal
-    inv.wood -= wood
-    inv.food -= food
-    inv.ammo -= ammo
-    inv.meds -= meds
-
-    clan.metal += metal
-    clan.wood += wood
-    clan.food += food
-    clan.ammo += ammo
-    clan.meds += meds
-
+    await db.execute(
+        update(Clan)
+        .where(Clan.id == clan_id)
+        .values(
+            metal=Clan.metal + metal,
+            wood=Clan.wood + wood,
+            food=Clan.food + food,
+            ammo=Clan.ammo + ammo,
+            meds=Clan.meds + meds,
+        )
+    )
     await db.commit()
+    await invalidate_clan_cache_by_id(db, clan_id)
 
     return {"success": True}
 
@@ -302,21 +315,10 @@ async def deposit_resources(
 @router.post("/kick")
 async def kick_member(
     player_id: int,
-    init_data: str = Query(...),
+    kicker=Depends(_require_role("leader", "officer", detail="Not authorized")),
     db: AsyncSession = Depends(get_db)
 ):
     """Kick a member (leader or officer only)"""
-    user = _get_user(init_data)
-    telegram_id = user["id"]
-
-    # Get kicker's membership
-    result = await db.execute(
-        select(ClanMember).where(ClanMember.player_id == telegram_id)
-    )
-    kicker = result.scalar_one_or_none()
-    if not kicker or kicker.role not in ("leader", "officer"):
-        raise HTTPException(status_code=403, detail="Not authorized")
-
     # Get target
     result = await db.execute(
         select(ClanMember).where(
@@ -336,6 +338,7 @@ async def kick_member(
 
     await db.delete(target)
     await db.commit()
+    await invalidate_clan_cache_by_id(db, kicker.clan_id)
 
     return {"success": True}
 
@@ -344,24 +347,13 @@ async def kick_member(
 async def promote_member(
     player_id: int,
     role: str = "officer",
-    init_data: str = Query(...),
+    promoter=Depends(_require_role("leader", detail="Only leader can promote")),
     db: AsyncSession = Depends(get_db)
 ):
     """Promote a member (leader only)"""
-    user = _get_user(init_data)
-    telegram_id = user["id"]
-
     if role not in ("officer", "member"):
         raise HTTPException(status_code=400, detail="Invalid role")
 
-    # Get promoter's membership
-    result = await db.execute(
-        select(ClanMember).where(ClanMember.player_id == telegram_id)
-    )
-    promoter = result.scalar_one_or_none()
-    if not promoter or promoter.role != "leader":
-        raise HTTPException(status_code=403, detail="Only leader can promote")
-
     # Get target
     result = await db.execute(
         select(ClanMember).where(
@@ -375,5 +367,6 @@ async def promote_member(
 
     target.role = role
     await db.commit()
+    await invalidate_clan_cache_by_id(db, promoter.clan_id)
 
     return {"success": True, "new_role": role}
@@ -1,33 +1,124 @@
 """
 Clan business logic — shared between REST API and Telegram bot.
 """
-from typing import Optional, Tuple
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
 from datetime import datetime, timezone
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import case, delete, exists, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
+from ...cache import cache_get_json, cache_set_json, cache_delete
 from ...database import async_session
 from ...models import Clan, ClanMember, Player, PlayerInventory, Building, JoinRequest
 from .map_generator import map_generator, CHUNK_SIZE
 
+# /base info is cached briefly; mutations below invalidate it
+CLAN_INFO_CACHE_TTL = 10  # seconds
+
+
+# The bot runs inside the API process, so chat lookups are also kept in
+# process memory; every clan mutation below goes through
+# _invalidate_clan_cache(), and the REST/game paths that change clans
+# directly call invalidate_clan_cache_by_id()
+CLAN_LOCAL_CACHE_TTL = 10  # seconds
+CLAN_LOCAL_CACHE_MAX = 4096
+
+_local_cache: Dict[str, Tuple[float, Any]] = {}
+_MISS = object()
+
+
+def _clan_info_key(chat_id: int) -> str:
+    return f"clan_info:{chat_id}"
+
+
+def _clan_key(chat_id: int) -> str:
+    return f"clan:{chat_id}"
+
+
+def _local_get(key: str) -> Any:
+    entry = _local_cache.get(key)
+    if entry is None:
+        return _MISS
+    expires, value = entry
+    if expires < time.monotonic():
+        del _local_cache[key]
+        return _MISS
+    return value
+
+
+def _local_set(key: str, value: Any, ttl: float):
+    now = time.monotonic()
+    if len(_local_cache) >= CLAN_LOCAL_CACHE_MAX:
+        for k in [k for k, (expires, _) in _local_cache.items() if expires < now]:
+            del _local_cache[k]
+        if len(_local_cache) >= CLAN_LOCAL_CACHE_MAX:
+            _local_cache.clear()
+    _local_cache[key] = (now + ttl, value)
+
+
+async def _invalidate_clan_cache(chat_id: int):
+    """Сбросить кэш клана группы (локальный и Redis)."""
+    _local_cache.pop(_clan_key(chat_id), None)
+    _local_cache.pop(_clan_info_key(chat_id), None)
+    await cache_delete(_clan_info_key(chat_id))
+
+
+async def invalidate_clan_cache_by_id(db, clan_id: int):
+    """Сбросить кэш клана по его id (для путей, где chat_id под рукой нет)."""
+    chat_id = await db.scalar(select(Clan.telegram_chat_id).where(Clan.id == clan_id))
+    if chat_id is not None:
+        await _invalidate_clan_cache(chat_id)
+
+
+async def _lookup_chat_and_player(db, chat_id: int, player_telegram_id: int):
+    """
+    Одним запросом: id клана группы, есть ли игрок, id клана игрока.
+    Returns row (clan_id, player_exists, member_clan_id).
+    """
+    result = await db.execute(select(
+        select(Clan.id).where(Clan.telegram_chat_id == chat_id)
+        .scalar_subquery().label("clan_id"),
+        exists().where(Player.telegram_id == player_telegram_id).label("player_exists"),
+        select(ClanMember.clan_id).where(ClanMember.player_id == player_telegram_id)
+        .scalar_subquery().label("member_clan_id"),
+    ))
+    return result.one()
+
+
+async def _upsert_player(db, telegram_id: int, username: Optional[str]):
+    """Создать игрока одним INSERT ... ON CONFLICT (без гонки между SELECT и INSERT)."""
+    stmt = pg_insert(Player).values(telegram_id=telegram_id, username=username)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[Player.telegram_id],
+        set_={"username": func.coalesce(Player.username, stmt.excluded.username)},
+    ))
+
 
 async def get_clan_by_chat_id(chat_id: int) -> Optional[dict]:
-    """Получить клан по Telegram chat_id."""
+    """Получить клан по Telegram chat_id (с коротким кэшем, включая «клана нет»)."""
+    key = _clan_key(chat_id)
+    cached = _local_get(key)
+    if cached is not _MISS:
+        return cached
+
     async with async_session() as db:
         result = await db.execute(
             select(Clan).where(Clan.telegram_chat_id == chat_id)
         )
         clan = result.scalar_one_or_none()
-        if not clan:
-            return None
-        return {
-            "id": clan.id,
-            "name": clan.name,
-            "telegram_chat_id": clan.telegram_chat_id,
-            "metal": clan.metal, "wood": clan.wood,
-            "food": clan.food, "ammo": clan.ammo, "meds": clan.meds,
-            "base_x": clan.base_x, "base_y": clan.base_y,
-        }
+        info = None
+        if clan:
+            info = {
+                "id": clan.id,
+                "name": clan.name,
+                "telegram_chat_id": clan.telegram_chat_id,
+                "metal": clan.metal, "wood": clan.wood,
+                "food": clan.food, "ammo": clan.ammo, "meds": clan.meds,
+                "base_x": clan.base_x, "base_y": clan.base_y,
+            }
+    _local_set(key, info, CLAN_LOCAL_CACHE_TTL)
+    return info
 
 
 async def create_clan_from_group(
@@ -41,52 +132,46 @@ async def create_clan_from_group(
     Returns (success, message, clan_id).
     """
     async with async_session() as db:
+        lookup = await _lookup_chat_and_player(db, chat_id, leader_telegram_id)
+
         # Проверить, не привязана ли группа уже
-        result = await db.execute(
-            select(Clan).where(Clan.telegram_chat_id == chat_id)
-        )
-        if result.scalar_one_or_none():
+        if lookup.clan_id is not None:
             return False, "База уже создана в этой группе!", None
 
-        # Убедиться что игрок существует
-        result = await db.execute(
-            select(Player).where(Player.telegram_id == leader_telegram_id)
-        )
-        player = result.scalar_one_or_none()
-        if not player:
-            player = Player(telegram_id=leader_telegram_id, username=leader_username)
-            db.add(player)
-            await db.flush()
-
         # Проверить, не состоит ли лидер уже в клане
-        result = await db.execute(
-            select(ClanMember).where(ClanMember.player_id == leader_telegram_id)
-        )
-        if result.scalar_one_or_none():
+        if lookup.member_clan_id is not None:
             return False, "Ты уже состоишь в другом клане!", None
 
+        # Убедиться что игрок существует
+        if not lookup.player_exists:
+            await _upsert_player(db, leader_telegram_id, leader_username)
+
         # Найти место для базы
-        base_cx, base_cy = map_generator.find_base_location()
+        base_cx, base_cy = await asyncio.to_thread(map_generator.find_base_location)
         base_x = base_cx * CHUNK_SIZE + CHUNK_SIZE // 2
         base_y = base_cy * CHUNK_SIZE + CHUNK_SIZE // 2
 
-        clan = Clan(
-            name=group_name,
-            telegram_chat_id=chat_id,
-            base_x=base_x, base_y=base_y,
+        # Клан и лидер — два INSERT в одной транзакции, без unit-of-work
+        clan_id = await db.scalar(
+            insert(Clan)
+            .values(
+                name=group_name,
+                telegram_chat_id=chat_id,
+                base_x=base_x, base_y=base_y,
+            )
+            .returning(Clan.id)
         )
-        db.add(clan)
-        await db.flush()
-
-        member = ClanMember(
-            clan_id=clan.id,
-            player_id=leader_telegram_id,
-            role="leader",
+        await db.execute(
+            insert(ClanMember).values(
+                clan_id=clan_id,
+                player_id=leader_telegram_id,
+                role="leader",
+            )
         )
-        db.add(member)
         await db.commit()
+        await _invalidate_clan_cache(chat_id)
 
-        return True, f"База «{group_name}» создана!", clan.id
+        return True, f"База «{group_name}» создана!", clan_id
 
 
 async def add_member_directly(
@@ -97,40 +182,29 @@ async def add_member_directly(
 ) -> Tuple[bool, str]:
     """Добавить участника напрямую (для админов)."""
     async with async_session() as db:
-        result = await db.execute(
-            select(Clan).where(Clan.telegram_chat_id == chat_id)
-        )
-        clan = result.scalar_one_or_none()
-        if not clan:
+        lookup = await _lookup_chat_and_player(db, chat_id, player_telegram_id)
+        if lookup.clan_id is None:
             return False, "В этой группе нет базы!"
 
-        # Убедиться что игрок существует
-        result = await db.execute(
-            select(Player).where(Player.telegram_id == player_telegram_id)
-        )
-        player = result.scalar_one_or_none()
-        if not player:
-            player = Player(telegram_id=player_telegram_id, username=player_username)
-            db.add(player)
-            await db.flush()
-
         # Проверить, не в клане ли уже
-        result = await db.execute(
-            select(ClanMember).where(ClanMember.player_id == player_telegram_id)
-        )
-        existing = result.scalar_one_or_none()
-        if existing:
-            if existing.clan_id == clan.id:
+        if lookup.member_clan_id is not None:
+            if lookup.member_clan_id == lookup.clan_id:
                 return False, "Ты уже на этой базе!"
             return False, "Ты уже состоишь в другом клане!"
 
-        member = ClanMember(
-            clan_id=clan.id,
-            player_id=player_telegram_id,
-            role=role,
+        # Убедиться что игрок существует
+        if not lookup.player_exists:
+            await _upsert_player(db, player_telegram_id, player_username)
+
+        await db.execute(
+            insert(ClanMember).values(
+                clan_id=lookup.clan_id,
+                player_id=player_telegram_id,
+                role=role,
+            )
         )
-        db.add(member)
         await db.commit()
+        await _invalidate_clan_cache(chat_id)
         return True, "Добро пожаловать на базу!"
 
 
@@ -144,62 +218,41 @@ async def create_join_request(
     Returns (success, message, join_request_id).
     """
     async with async_session() as db:
-        result = await db.execute(
-            select(Clan).where(Clan.telegram_chat_id == chat_id)
-        )
-        clan = result.scalar_one_or_none()
-        if not clan:
+        lookup = await _lookup_chat_and_player(db, chat_id, player_telegram_id)
+        if lookup.clan_id is None:
             return False, "В этой группе нет базы! Админ должен написать /start", None
+        clan_id = lookup.clan_id
 
-        # Убедиться что игрок существует
-        result = await db.execute(
-            select(Player).where(Player.telegram_id == player_telegram_id)
-        )
-        player = result.scalar_one_or_none()
-        if not player:
-            player = Player(telegram_id=player_telegram_id, username=player_username)
-            db.add(player)
-            await db.flush()
-
-        # Проверить, не состоит ли уже в этом клане
-        result = await db.execute(
-            select(ClanMember).where(
-                ClanMember.player_id == player_telegram_id,
-                ClanMember.clan_id == clan.id
-            )
-        )
-        if result.scalar_one_or_none():
+        # Проверить, не состоит ли уже в этом или другом клане
+        if lookup.member_clan_id == clan_id:
             return False, "Ты уже на этой базе!", None
-
-        # Проверить, не состоит ли в другом клане
-        result = await db.execute(
-            select(ClanMember).where(ClanMember.player_id == player_telegram_id)
-        )
-        if result.scalar_one_or_none():
+        if lookup.member_clan_id is not None:
             return False, "Ты уже состоишь в другом клане! Сначала покинь его.", None
 
-        # Проверить pending заявку
-        result = await db.execute(
-            select(JoinRequest).where(
-                JoinRequest.clan_id == clan.id,
-                JoinRequest.player_id == player_telegram_id,
-                JoinRequest.status == "pending"
+        # Убедиться что игрок существует
+        if not lookup.player_exists:
+            await _upsert_player(db, player_telegram_id, player_username)
+
+        # Уникальный частичный индекс отсекает повторную pending заявку
+        jr_id = await db.scalar(
+            pg_insert(JoinRequest)
+            .values(
+                clan_id=clan_id,
+                player_id=player_telegram_id,
+                chat_id=chat_id,
+                status="pending",
+            )
+            .on_conflict_do_nothing(
+                index_elements=["clan_id", "player_id"],
+                index_where=JoinRequest.status == "pending",
             )
+            .returning(JoinRequest.id)
         )
-        if result.scalar_one_or_none():
+        if jr_id is None:
             return False, "Твоя заявка уже на рассмотрении!", None
 
-        jr = JoinRequest(
-            clan_id=clan.id,
-            player_id=player_telegram_id,
-            chat_id=chat_id,
-            status="pending",
-        )
-        db.add(jr)
         await db.commit()
-        await db.refresh(jr)
-
-        return True, "ok", jr.id
+        return True, "ok", jr_id
 
 
 async def update_join_request_message(request_id: int, message_id: int):
@@ -224,11 +277,15 @@ async def resolve_join_request(
     Returns (success, message).
     """
     async with async_session() as db:
+        # Только pending заявка, под блокировкой до commit: второй админ,
+        # нажавший одновременно, пропустит строку и не одобрит её повторно
         result = await db.execute(
-            select(JoinRequest).where(JoinRequest.id == request_id)
+            select(JoinRequest)
+            .where(JoinRequest.id == request_id, JoinRequest.status == "pending")
+            .with_for_update(skip_locked=True)
         )
         jr = result.scalar_one_or_none()
-        if not jr or jr.status != "pending":
+        if not jr:
             return False, "Заявка не найдена или уже обработана"
 
         jr.resolved_by = admin_telegram_id
@@ -236,13 +293,16 @@ async def resolve_join_request(
 
         if approved:
             jr.status = "approved"
-            member = ClanMember(
-                clan_id=jr.clan_id,
-                player_id=jr.player_id,
-                role="member",
+            # Статус заявки и новый участник фиксируются одним commit
+            await db.execute(
+                insert(ClanMember).values(
+                    clan_id=jr.clan_id,
+                    player_id=jr.player_id,
+                    role="member",
+                )
             )
-            db.add(member)
             await db.commit()
+            await _invalidate_clan_cache(jr.chat_id)
             return True, "approved"
         else:
             jr.status = "rejected"
@@ -253,65 +313,104 @@ async def resolve_join_request(
 async def leave_clan(player_telegram_id: int) -> Tuple[bool, str]:
     """Покинуть клан."""
     async with async_session() as db:
+        # Удалить членство и сразу узнать клан, роль и chat_id (DELETE ... USING clans)
         result = await db.execute(
-            select(ClanMember).where(ClanMember.player_id == player_telegram_id)
+            delete(ClanMember)
+            .where(
+                ClanMember.player_id == player_telegram_id,
+                ClanMember.clan_id == Clan.id,
+            )
+            .returning(ClanMember.clan_id, ClanMember.role, Clan.telegram_chat_id)
+            .execution_options(synchronize_session=False)
         )
-        membership = result.scalar_one_or_none()
-        if not membership:
+        left = result.one_or_none()
+        if not left:
             return False, "Ты не состоишь ни в одном клане!"
-
-        if membership.role == "leader":
-            result = await db.execute(
-                select(ClanMember).where(
-                    ClanMember.clan_id == membership.clan_id,
-                    ClanMember.player_id != player_telegram_id
-                )
+        clan_id, role, chat_id = left
+
+        if role == "leader":
+            # Передать лидерство: первый офицер, иначе первый участник
+            successor = (
+                select(ClanMember.id)
+                .where(ClanMember.clan_id == clan_id)
+                .order_by(case((ClanMember.role == "officer", 0), else_=1), ClanMember.id)
+                .limit(1)
+                .scalar_subquery()
+            )
+            await db.execute(
+                update(ClanMember)
+                .where(ClanMember.id == successor)
+                .values(role="leader")
+                .execution_options(synchronize_session=False)
             )
-            others = result.scalars().all()
-            if others:
-                new_leader = next((m for m in others if m.role == "officer"), others[0])
-                new_leader.role = "leader"
 
-        await db.delete(membership)
         await db.commit()
+        await _invalidate_clan_cache(chat_id)
         return True, "Ты покинул базу!"
 
 
 async def get_clan_info_for_group(chat_id: int) -> Optional[dict]:
     """Получить полную информацию о базе для отображения в группе."""
-    async with async_session() as db:
-        result = await db.execute(
-            select(Clan).where(Clan.telegram_chat_id == chat_id)
+    cache_key = _clan_info_key(chat_id)
+    info = _local_get(cache_key)
+    if info is not _MISS:
+        return info
+    info = await cache_get_json(cache_key)
+    if info is not None:
+        _local_set(cache_key, info, CLAN_LOCAL_CACHE_TTL)
+        return info
+
+    # Clan row with its building count, counted once in a derived table
+    # rather than re-evaluated for every joined member row
+    clan = (
+        select(
+            Clan.id, Clan.name, Clan.metal, Clan.wood, Clan.food, Clan.ammo, Clan.meds,
+            select(func.count(Building.id))
+            .where(Building.clan_id == Clan.id)
+            .scalar_subquery()
+            .label("building_count"),
         )
-        clan = result.scalar_one_or_none()
-        if not clan:
-            return None
+        .where(Clan.telegram_chat_id == chat_id)
+        .subquery()
+    )
 
+    # Clan + members + building count in one round-trip
+    async with async_session() as db:
         result = await db.execute(
-            select(ClanMember)
-            .options(selectinload(ClanMember.player))
-            .where(ClanMember.clan_id == clan.id)
+            select(
+                clan.c.name, clan.c.metal, clan.c.wood, clan.c.food, clan.c.ammo, clan.c.meds,
+                clan.c.building_count,
+                ClanMember.player_id, ClanMember.role, Player.username,
+            )
+            .select_from(clan)
+            .outerjoin(ClanMember, ClanMember.clan_id == clan.c.id)
+            .outerjoin(Player, Player.telegram_id == ClanMember.player_id)
         )
-        members = []
-        for m in result.scalars().all():
-            members.append({
-                "player_id": m.player_id,
-                "username": m.player.username if m.player else "???",
-                "role": m.role,
-            })
+        rows = result.all()
 
-        result = await db.execute(
-            select(Building).where(Building.clan_id == clan.id)
-        )
-        building_count = len(result.scalars().all())
-
-        return {
-            "name": clan.name,
-            "members": members,
-            "member_count": len(members),
-            "building_count": building_count,
-            "resources": {
-                "metal": clan.metal, "wood": clan.wood,
-                "food": clan.food, "ammo": clan.ammo, "meds": clan.meds,
-            },
+    if not rows:
+        return None
+
+    first = rows[0]
+    members = [
+        {
+            "player_id": r.player_id,
+            "username": r.username or "???",
+            "role": r.role,
         }
+        for r in rows if r.player_id is not None
+    ]
+
+    info = {
+        "name": first.name,
+        "members": members,
+        "member_count": len(members),
+        "building_count": first.building_count,
+        "resources": {
+            "metal": first.metal, "wood": first.wood,
+            "food": first.food, "ammo": first.ammo, "meds": first.meds,
+        },
+    }
+    await cache_set_json(cache_key, info, CLAN_INFO_CACHE_TTL)
+    _local_set(cache_key, info, CLAN_LOCAL_CACHE_TTL)
+    return info
@@ -2,6 +2,8 @@
 Clothing system — items that drop from zombies and provide armor.
 """
 import random
+from bisect import bisect
+from itertools import accumulate
 
 CLOTHING_ITEMS = {
     # Head
@@ -87,26 +89,43 @@ _RARITY_WEIGHTS = {
     "rare": 10,
 }
 
-# Pre-build pools by rarity
-_POOLS = {}
-for _code, _item in CLOTHING_ITEMS.items():
-    r = _item["rarity"]
-    _POOLS.setdefault(r, []).append(_code)
+# Cumulative weights for one bisect per draw (what random.choices does
+# internally, minus rebuilding the lists on every call)
+_RARITY_NAMES = tuple(_RARITY_WEIGHTS)
+_RARITY_CUM = tuple(accumulate(_RARITY_WEIGHTS.values()))
+_RARITY_TOTAL = _RARITY_CUM[-1]
+
+# Item tables as parallel tuples indexed by integer item id; codes are
+# only needed at the network/DB boundary (see code_of)
+CLOTHING_CODES = tuple(CLOTHING_ITEMS)
+CLOTHING_ID = {code: i for i, code in enumerate(CLOTHING_CODES)}
+CLOTHING_SLOTS = tuple(item["slot"] for item in CLOTHING_ITEMS.values())
+CLOTHING_NAMES = tuple(item["name"] for item in CLOTHING_ITEMS.values())
+CLOTHING_ARMOR = tuple(item["armor"] for item in CLOTHING_ITEMS.values())
+CLOTHING_MAX_DURABILITY = tuple(item["max_durability"] for item in CLOTHING_ITEMS.values())
+CLOTHING_RARITY = tuple(item["rarity"] for item in CLOTHING_ITEMS.values())
+
+# Pools of item ids, aligned with _RARITY_NAMES
+_POOLS = tuple(
+    tuple(i for i, r in enumerate(CLOTHING_RARITY) if r == rarity)
+    for rarity in _RARITY_NAMES
+)
+
+
+def code_of(item_id: int) -> str:
+    """Clothing code for an item id (for serialization)."""
+    return CLOTHING_CODES[item_id]
 
 
 def generate_clothing_drop(zombie_type: str):
     """Generate a random clothing drop from a killed zombie.
-    Returns clothing code (str) or None."""
+    Returns clothing item id (int) or None."""
     chance = _DROP_CHANCE.get(zombie_type, 0.10)
     if random.random() > chance:
         return None
 
     # Weighted rarity selection
-    rarities = list(_RARITY_WEIGHTS.keys())
-    weights = list(_RARITY_WEIGHTS.values())
-    rarity = random.choices(rarities, weights=weights, k=1)[0]
-
-    pool = _POOLS.get(rarity, [])
+    pool = _POOLS[bisect(_RARITY_CUM, random.random() * _RARITY_TOTAL)]
     if not pool:
         return None
 
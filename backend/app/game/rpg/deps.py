@@ -0,0 +1,40 @@
+"""
+FastAPI dependencies shared by the clan and building REST routes.
+"""
+from fastapi import Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...database import get_db
+from ...models import ClanMember
+from ...auth import validate_telegram_data
+
+
+async def current_user(init_data: str = Query(...)) -> dict:
+    """Validated Telegram user; FastAPI resolves it once per request."""
+    user = validate_telegram_data(init_data)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid auth")
+    return user
+
+
+def require_role(*roles: str, not_member_detail: str, detail: str = ""):
+    """Dependency factory: the user's (clan_id, role) row.
+
+    Not being in a clan and lacking one of `roles` (when given) both answer
+    403; the messages come from the router so each keeps its own wording.
+    """
+    async def dependency(
+        user: dict = Depends(current_user),
+        db: AsyncSession = Depends(get_db),
+    ):
+        result = await db.execute(
+            select(ClanMember.clan_id, ClanMember.role).where(ClanMember.player_id == user["id"])
+        )
+        membership = result.one_or_none()
+        if not membership:
+            raise HTTPException(status_code=403, detail=not_member_detail)
+        if roles and membership.role not in roles:
+            raise HTTPException(status_code=403, detail=detail)
+        return membership
+    return dependency
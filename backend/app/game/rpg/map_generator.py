@@ -4,6 +4,7 @@
 
 import random
 import math
+from functools import lru_cache
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 
@@ -12,6 +13,9 @@ CHUNK_SIZE = 1024  # 1024x1024 пикселей
 TILE_SIZE = 32     # 32x32 пикселей на тайл
 TILES_PER_CHUNK = CHUNK_SIZE // TILE_SIZE  # 32x32 тайлов в чанке
 
+# Сколько terrain чанков держать в памяти (детерминированы по seed)
+TERRAIN_CACHE_SIZE = 1024
+
 # Типы тайлов
 TILE_GRASS = 0
 TILE_DIRT = 1
@@ -41,62 +45,140 @@ class SpawnPoint:
     spawn_rate: float  # zombies per minute
 
 
+# Тайлы, на которых нельзя ставить базу
+_BASE_BLOCKING_TILES = frozenset((TILE_WATER, TILE_ROCK))
+
+
+def terrain_to_grid(terrain: bytes) -> List[List[int]]:
+    """Плоский terrain (bytes) -> сетка [ty][tx] для JSON (клиент, БД)"""
+    return [
+        list(terrain[i:i + TILES_PER_CHUNK])
+        for i in range(0, TILES_PER_CHUNK * TILES_PER_CHUNK, TILES_PER_CHUNK)
+    ]
+
+
+def terrain_from_grid(grid) -> bytes:
+    """Сетка [ty][tx] -> плоский terrain, индекс ty * TILES_PER_CHUNK + tx"""
+    return bytes(tile for row in grid for tile in row)
+
+
+def _ring(radius: int):
+    """
+    Смещения (dx, dy) квадратного кольца радиуса radius — в том же порядке,
+    что и обход квадрата (dx, dy) с отбрасыванием внутренних клеток.
+    """
+    edge = range(-radius, radius + 1)
+    for dx in edge:
+        if dx == -radius or dx == radius:
+            for dy in edge:
+                yield dx, dy
+        else:
+            yield dx, -radius
+            yield dx, radius
+
+
+
 class MapGenerator:
     """Генератор процедурной карты"""
 
     def __init__(self, world_seed: int = 42):
         self.world_seed = world_seed
+        # (chunk_x, chunk_y) -> годится ли центр чанка под базу
+        self._base_map: Dict[Tuple[int, int], bool] = {}
 
     def _get_chunk_seed(self, chunk_x: int, chunk_y: int) -> int:
         """Получить seed для конкретного чанка"""
         return hash((self.world_seed, chunk_x, chunk_y)) & 0xFFFFFFFF
 
-    def _noise(self, x: float, y: float, seed: int) -> float:
-        """Простой шум для генерации terrain"""
-        random.seed(seed + int(x * 1000 + y))
-        return random.random()
+    @lru_cache(maxsize=TERRAIN_CACHE_SIZE)
+    def get_terrain(self, chunk_x: int, chunk_y: int) -> bytes:
+        """
+        Terrain чанка из кэша: плоские bytes (1 КБ), тайл (tx, ty) —
+        terrain[ty * TILES_PER_CHUNK + tx]. Зависит только от
+        (world_seed, chunk_x, chunk_y); bytes неизменяемы, поэтому безопасно
+        разделяются между вызывающими.
+        """
+        return self._generate_terrain(chunk_x, chunk_y, self._get_chunk_seed(chunk_x, chunk_y))
+
+    def _generate_terrain(self, chunk_x: int, chunk_y: int, seed: int,
+                          octaves: int = 4) -> bytes:
+        """Terrain всего чанка, построчно склеенный в bytes (см. _terrain_rows)"""
+        return b"".join(
+            bytes(row)
+            for row in self._terrain_rows(chunk_x, chunk_y, seed, 0, TILES_PER_CHUNK, octaves)
+        )
 
-    def _perlin_like(self, x: float, y: float, seed: int, octaves: int = 4) -> float:
-        """Упрощённый perlin-подобный шум"""
-        value = 0.0
-        amplitude = 1.0
-        frequency = 1.0
-        max_value = 0.0
+    def _terrain_rows(self, chunk_x: int, chunk_y: int, seed: int,
+                      lo: int, hi: int, octaves: int = 4):
+        """
+        Строки terrain окна [lo, hi) x [lo, hi) чанка. Шум тайла —
+        perlin-подобная сумма октав в точке (world_x * 0.1, world_y * 0.1):
+        октава с частотой f и амплитудой a даёт a * hash(seed, ix, iy),
+        где (ix, iy) — целая ячейка координат, умноженных на f; сумма
+        нормируется на сумму амплитуд. Хэш целочисленный, без
+        random.seed() на каждый тайл.
+
+        Считается по строкам: координаты октав — один раз на
+        столбец/строку, хэш — один раз на уникальную ячейку октавы (на
+        низких частотах ячейка покрывает до 10 тайлов). Генератор: можно
+        остановиться на первой неподходящей строке.
+        """
+        base_x = chunk_x * TILES_PER_CHUNK
+        base_y = chunk_y * TILES_PER_CHUNK
+        tiles = range(lo, hi)
 
+        amplitudes = []
+        frequencies = []
+        amplitude, frequency, max_value = 1.0, 1.0, 0.0
         for _ in range(octaves):
-            ix, iy = int(x * frequency), int(y * frequency)
-            value += self._noise(ix, iy, seed) * amplitude
+            amplitudes.append(amplitude)
+            frequencies.append(frequency)
             max_value += amplitude
             amplitude *= 0.5
             frequency *= 2.0
 
-        return value / max_value
-
-    def generate_chunk(self, chunk_x: int, chunk_y: int) -> Dict:
-        """
-        Сгенерировать чанк карты
+        # Октавные координаты ячеек по столбцам (зависят только от tx)
+        col_cells = [
+            [int((base_x + tx) * 0.1 * f) for tx in tiles] for f in frequencies
+        ]
+        # Хэш ячейки — XOR слагаемых по seed, x и y: часть (seed, x)
+        # считается один раз на уникальную ячейку столбца, а не на каждую строку
+        seed_h = seed * 2654435761
+        col_hashes = [
+            [(ix, seed_h ^ ix * 374761393) for ix in set(cells)] for cells in col_cells
+        ]
+        # Вклад октавы зависит от строки только через iy: на низких частотах
+        # соседние строки попадают в ту же ячейку и переиспользуют его
+        last_iy = [None] * octaves
+        last_row = [None] * octaves
+
+        for ty in tiles:
+            y = (base_y + ty) * 0.1
+            # Для каждой октавы — вклад в каждый тайл строки
+            for o in range(octaves):
+                iy = int(y * frequencies[o])
+                if iy == last_iy[o]:
+                    continue
+                y_h = iy * 668265263
+                amp = amplitudes[o]
+                by_cell = {}
+                for ix, xs_h in col_hashes[o]:
+                    # Перемешивание хэша (seed, ix, iy) -> [0, 1)
+                    h = (xs_h ^ y_h) & 0xFFFFFFFF
+                    h ^= h >> 13
+                    h = (h * 1274126177) & 0xFFFFFFFF
+                    h ^= h >> 16
+                    by_cell[ix] = (h & 0xFFFFFF) / 0x1000000 * amp
+                last_iy[o] = iy
+                last_row[o] = [by_cell[ix] for ix in col_cells[o]]
+            octave_rows = last_row
 
-        Returns:
-            {
-                "terrain": [[tile_type, ...], ...],
-                "resources": [ResourceNode, ...],
-                "spawn_points": [SpawnPoint, ...]
-            }
-        """
-        seed = self._get_chunk_seed(chunk_x, chunk_y)
-        random.seed(seed)
-
-        # Генерация terrain
-        terrain = []
-        for ty in range(TILES_PER_CHUNK):
             row = []
-            for tx in range(TILES_PER_CHUNK):
-                # Мировые координаты тайла
-                world_x = chunk_x * TILES_PER_CHUNK + tx
-                world_y = chunk_y * TILES_PER_CHUNK + ty
-
-                # Шум для определения типа тайла
-                noise_val = self._perlin_like(world_x * 0.1, world_y * 0.1, seed)
+            for parts in zip(*octave_rows):
+                value = 0.0
+                for part in parts:
+                    value += part
+                noise_val = value / max_value
 
                 if noise_val < 0.15:
                     tile = TILE_WATER
@@ -108,29 +190,47 @@ class MapGenerator:
                     tile = TILE_FOREST
                 else:
                     tile = TILE_ROCK
-
                 row.append(tile)
-            terrain.append(row)
+            yield tuple(row)
+
+    def generate_chunk(self, chunk_x: int, chunk_y: int) -> Dict:
+        """
+        Сгенерировать чанк карты
+
+        Returns:
+            {
+                "terrain": bytes,  # плоский, ty * TILES_PER_CHUNK + tx
+                "resources": [ResourceNode, ...],
+                "spawn_points": [SpawnPoint, ...]
+            }
+        """
+        seed = self._get_chunk_seed(chunk_x, chunk_y)
+        # Свой RNG на чанк: не трогает глобальный random и позволяет
+        # генерировать чанки параллельно (asyncio.to_thread)
+        rng = random.Random(seed)
+
+        # Генерация terrain (кэшируется отдельно от ресурсов и спавнов)
+        terrain = self.get_terrain(chunk_x, chunk_y)
 
         # Генерация ресурсов
         resources = []
-        num_resources = random.randint(3, 8)
+        num_resources = rng.randint(3, 8)
         for _ in range(num_resources):
-            tx = random.randint(2, TILES_PER_CHUNK - 3)
-            ty = random.randint(2, TILES_PER_CHUNK - 3)
+            tx = rng.randint(2, TILES_PER_CHUNK - 3)
+            ty = rng.randint(2, TILES_PER_CHUNK - 3)
 
             # Проверяем что не на воде
-            if terrain[ty][tx] == TILE_WATER:
+            if terrain[ty * TILES_PER_CHUNK + tx] == TILE_WATER:
                 continue
 
             # Тип ресурса зависит от terrain
-            tile = terrain[ty][tx]
+            tile = terrain[ty * TILES_PER_CHUNK + tx]
             if tile == TILE_ROCK:
                 res_type = "metal"
-                amount = random.randint(50, 150)
+                amount = rng.randint(50, 150)
             elif tile == TILE_FOREST:
                 res_type = "wood"
-                amount = random.randint(30, 100)
+                amount = rng.randint(30, 100)
             else:
                 continue
 
@@ -147,11 +247,11 @@ class MapGenerator:
             })
 
         # Генерация мусорных корзин (содержимое неизвестно до сбора)
-        num_trash = random.randint(2, 5)
+        num_trash = rng.randint(2, 5)
         for _ in range(num_trash):
-            tx = random.randint(1, TILES_PER_CHUNK - 2)
-            ty = random.randint(1, TILES_PER_CHUNK - 2)
-            tile = terrain[ty][tx]
+            tx = rng.randint(1, TILES_PER_CHUNK - 2)
+            ty = rng.randint(1, TILES_PER_CHUNK - 2)
+            tile = terrain[ty * TILES_PER_CHUNK + tx]
             if tile in (TILE_WATER, TILE_ROCK):
                 continue
             world_x = chunk_x * CHUNK_SIZE + tx * TILE_SIZE + TILE_SIZE // 2
@@ -166,17 +266,17 @@ class MapGenerator:
 
         # Генерация точек спавна зомби
         spawn_points = []
-        num_spawns = random.randint(1, 3)
+        num_spawns = rng.randint(1, 3)
 
         # Дальше от центра = больше зомби
         distance_from_center = math.sqrt(chunk_x ** 2 + chunk_y ** 2)
         danger_multiplier = min(2.0, 1.0 + distance_from_center * 0.1)
 
         for _ in range(num_spawns):
-            tx = random.randint(5, TILES_PER_CHUNK - 6)
-            ty = random.randint(5, TILES_PER_CHUNK - 6)
+            tx = rng.randint(5, TILES_PER_CHUNK - 6)
+            ty = rng.randint(5, TILES_PER_CHUNK - 6)
 
-            if terrain[ty][tx] == TILE_WATER:
+            if terrain[ty * TILES_PER_CHUNK + tx] == TILE_WATER:
                 continue
 
             world_x = chunk_x * CHUNK_SIZE + tx * TILE_SIZE + TILE_SIZE // 2
@@ -188,7 +288,7 @@ class MapGenerator:
                 zombie_types.append("fast")
             if danger_multiplier > 1.5:
                 zombie_types.append("tank")
-            if danger_multiplier > 1.8 and random.random() < 0.1:
+            if danger_multiplier > 1.8 and rng.random() < 0.1:
                 zombie_types.append("boss")
 
             spawn_points.append({
@@ -208,15 +308,14 @@ class MapGenerator:
 
     def get_safe_spawn_position(self, chunk_x: int, chunk_y: int) -> Tuple[float, float]:
         """Найти безопасную позицию для спавна в чанке"""
-        chunk_data = self.generate_chunk(chunk_x, chunk_y)
-        terrain = chunk_data["terrain"]
+        terrain = self.get_terrain(chunk_x, chunk_y)
 
         # Ищем тайл с травой или землёй
         for attempt in range(100):
             tx = random.randint(5, TILES_PER_CHUNK - 6)
             ty = random.randint(5, TILES_PER_CHUNK - 6)
 
-            if terrain[ty][tx] in [TILE_GRASS, TILE_DIRT]:
+            if terrain[ty * TILES_PER_CHUNK + tx] in [TILE_GRASS, TILE_DIRT]:
                 world_x = chunk_x * CHUNK_SIZE + tx * TILE_SIZE + TILE_SIZE // 2
                 world_y = chunk_y * CHUNK_SIZE + ty * TILE_SIZE + TILE_SIZE // 2
                 return (world_x, world_y)
@@ -227,6 +326,21 @@ class MapGenerator:
             chunk_y * CHUNK_SIZE + CHUNK_SIZE // 2
         )
 
+    def _is_base_suitable(self, chunk_x: int, chunk_y: int) -> bool:
+        """
+        Центр чанка 10x10 без воды и скал. Считается только само окно (без
+        генерации и кэширования всего terrain), результат запоминается.
+        """
+        key = (chunk_x, chunk_y)
+        suitable = self._base_map.get(key)
+        if suitable is None:
+            lo = TILES_PER_CHUNK // 2 - 5
+            rows = self._terrain_rows(chunk_x, chunk_y,
+                                      self._get_chunk_seed(chunk_x, chunk_y), lo, lo + 10)
+            suitable = all(_BASE_BLOCKING_TILES.isdisjoint(row) for row in rows)
+            self._base_map[key] = suitable
+        return suitable
+
     def find_base_location(self, preferred_chunk_x: int = 0, preferred_chunk_y: int = 0) -> Tuple[int, int]:
         """
         Найти подходящее место для базы клана
@@ -236,30 +350,11 @@ class MapGenerator:
         """
         # Ищем по спирали от центра
         for radius in range(1, 50):
-            for dx in range(-radius, radius + 1):
-                for dy in range(-radius, radius + 1):
-                    if abs(dx) != radius and abs(dy) != radius:
-                        continue
-
-                    chunk_x = preferred_chunk_x + dx
-                    chunk_y = preferred_chunk_y + dy
-
-                    chunk_data = self.generate_chunk(chunk_x, chunk_y)
-                    terrain = chunk_data["terrain"]
-
-                    # Проверяем есть ли достаточно места (центр чанка)
-                    center = TILES_PER_CHUNK // 2
-                    suitable = True
-                    for tx in range(center - 5, center + 5):
-                        for ty in range(center - 5, center + 5):
-                            if terrain[ty][tx] in [TILE_WATER, TILE_ROCK]:
-                                suitable = False
-                                break
-                        if not suitable:
-                            break
-
-                    if suitable:
-                        return (chunk_x, chunk_y)
+            for dx, dy in _ring(radius):
+                chunk_x = preferred_chunk_x + dx
+                chunk_y = preferred_chunk_y + dy
+                if self._is_base_suitable(chunk_x, chunk_y):
+                    return (chunk_x, chunk_y)
 
         # Fallback
         return (preferred_chunk_x, preferred_chunk_y)
@@ -2,32 +2,44 @@
 Shared production calculation for buildings.
 Lazy/pull-based: no periodic DB writes, just compute on demand.
 """
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def _as_utc(dt: datetime) -> datetime:
+    """Treat naive datetimes (DB columns, utcnow) as UTC"""
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
 
 
 def calculate_production(last_collected: datetime, production_rate: float,
-                         storage_capacity: int) -> dict:
+                         storage_capacity: int, now: Optional[datetime] = None) -> dict:
     """Calculate current production for a building.
 
     Returns dict with:
         produced: int - resources accumulated (capped at storage)
         fill_ratio: float - 0.0 to 1.0
         seconds_to_full: float - seconds until storage is full (-1 if full)
+
+    Pass `now` to share one timestamp across a request. Naive and aware
+    datetimes may be mixed; naive ones are taken as UTC.
     """
-    now = datetime.utcnow()
-    hours_since = (now - last_collected).total_seconds() / 3600
-    raw_produced = hours_since * production_rate
+    now = datetime.now(timezone.utc) if now is None else _as_utc(now)
+
+    # Work in resource-seconds: one division per result instead of
+    # converting elapsed time to hours first
+    elapsed = (now - _as_utc(last_collected)).total_seconds()
+    raw_units = elapsed * production_rate
 
     cap = storage_capacity if storage_capacity > 0 else 999999
-    produced = min(int(raw_produced), cap)
+    cap_units = cap * 3600
+    produced = min(int(raw_units) // 3600, cap)
 
-    fill_ratio = min(1.0, raw_produced / cap) if cap > 0 else 0.0
+    fill_ratio = min(1.0, raw_units / cap_units)
 
     if fill_ratio >= 1.0:
         seconds_to_full = -1
     elif production_rate > 0:
-        remaining = cap - raw_produced
-        seconds_to_full = (remaining / production_rate) * 3600
+        seconds_to_full = (cap_units - raw_units) / production_rate
     else:
         seconds_to_full = -1
 
@@ -1,9 +1,9 @@
 """
 Active chunk in memory — holds terrain, resources, zombies, handles spawning.
 """
+import base64
 import random
 import time
-import math
 from typing import Dict, List, Optional, Tuple
 
 from .map_generator import (
@@ -14,6 +14,18 @@ from .map_generator import (
 from .world_zombie_entity import WorldZombieEntity
 
 
+# Bucket size (px) of the per-chunk spatial grids; matches the
+# +-200 px "nearby zombies" box around spawn points
+_GRID_CELL = 200
+
+# world_engine.SAFE_ZONE_RADIUS squared
+_SAFE_ZONE_R2 = 450 * 450
+
+
+def _cell(x: float, y: float) -> Tuple[int, int]:
+    return int(x // _GRID_CELL), int(y // _GRID_CELL)
+
+
 class ResourceNode:
     """An active resource node in a chunk"""
     _next_id = 1
@@ -63,11 +75,11 @@ class WorldChunk:
 
     ZOMBIE_SPAWN_INTERVAL = 15.0  # seconds between spawn checks
 
-    def __init__(self, chunk_x: int, chunk_y: int, terrain: list, resources_data: list,
+    def __init__(self, chunk_x: int, chunk_y: int, terrain: bytes, resources_data: list,
                  spawn_points_data: list, seed: int):
         self.chunk_x = chunk_x
         self.chunk_y = chunk_y
-        self.terrain = terrain  # 32x32 grid of tile types
+        self.terrain = terrain  # flat 32x32 tile types, index ty * TILES_PER_CHUNK + tx
         self.seed = seed
 
         # Resources
@@ -81,11 +93,17 @@ class WorldChunk:
             )
             self.resources[node.id] = node
 
+        # Resources never move, so their grid is built once
+        self._resource_grid: Dict[Tuple[int, int], List[ResourceNode]] = {}
+        for node in self.resources.values():
+            self._resource_grid.setdefault(_cell(node.x, node.y), []).append(node)
+
         # Spawn points
         self.spawn_points = spawn_points_data
 
-        # Buildings (loaded from DB, sent to client)
-        self.buildings: list = []
+        # Buildings (loaded from DB, sent to client); walls/gates derived lazily
+        self._buildings: list = []
+        self._walls: Optional[list] = None
 
         # Zombies in this chunk
         self.zombies: Dict[int, WorldZombieEntity] = {}
@@ -115,7 +133,7 @@ class WorldChunk:
     def get_tile_at_local(self, tx: int, ty: int) -> int:
         """Get tile type at local tile coordinates"""
         if 0 <= tx < TILES_PER_CHUNK and 0 <= ty < TILES_PER_CHUNK:
-            return self.terrain[ty][tx]
+            return self.terrain[ty * TILES_PER_CHUNK + tx]
         return 0  # default grass
 
     def get_tile_at_world(self, world_x: float, world_y: float) -> Optional[int]:
@@ -128,14 +146,26 @@ class WorldChunk:
             return self.get_tile_at_local(tx, ty)
         return None
 
+    @property
+    def buildings(self) -> list:
+        return self._buildings
+
+    @buildings.setter
+    def buildings(self, value: list):
+        # Building lists are always replaced, never mutated in place, so
+        # assignment is the one place the walls cache goes stale
+        self._buildings = value
+        self._walls = None
+
     def _get_walls(self) -> list:
-        """Extract wall and gate buildings for zombie collision checks."""
-        walls = []
-        for b in self.buildings:
-            tc = b.get('type_code', '')
-            if tc.startswith('wall_') or tc.startswith('gate_'):
-                walls.append(b)
-        return walls
+        """Wall and gate buildings for zombie collision checks (cached until
+        the building list is replaced)."""
+        if self._walls is None:
+            self._walls = [
+                b for b in self._buildings
+                if b.get('type_code', '').startswith(('wall_', 'gate_'))
+            ]
+        return self._walls
 
     def update(self, dt: float, players: list, safe_zones: list = None) -> List[dict]:
         """Update chunk: spawn zombies, update existing ones. Returns events."""
@@ -173,6 +203,10 @@ class WorldChunk:
 
     def _try_spawn_zombies(self, safe_zones: list = None):
         """Try to spawn zombies at spawn points"""
+        # Zombies move every tick, so they are bucketed per spawn check
+        # rather than tracked in a persistent grid
+        zombie_grid = None
+
         for sp in self.spawn_points:
             # Skip spawn points inside clan base safe zones
             if safe_zones:
@@ -180,15 +214,27 @@ class WorldChunk:
                 for sx, sy in safe_zones:
                     dx = sp["x"] - sx
                     dy = sp["y"] - sy
-                    if dx * dx + dy * dy < 450 * 450:  # SAFE_ZONE_RADIUS squared
+                    if dx * dx + dy * dy < _SAFE_ZONE_R2:
                         in_safe = True
                         break
                 if in_safe:
                     continue
 
-            # Count zombies near this spawn point
-            nearby = sum(1 for z in self.zombies.values()
-                        if abs(z.x - sp["x"]) < 200 and abs(z.y - sp["y"]) < 200)
+            if zombie_grid is None:
+                zombie_grid = {}
+                for z in self.zombies.values():
+                    zombie_grid.setdefault(_cell(z.x, z.y), []).append(z)
+
+            # Count zombies near this spawn point: the +-200 px box only
+            # reaches the 3x3 buckets around it
+            spx, spy = sp["x"], sp["y"]
+            bx, by = _cell(spx, spy)
+            nearby = 0
+            for gx in (bx - 1, bx, bx + 1):
+                for gy in (by - 1, by, by + 1):
+                    for z in zombie_grid.get((gx, gy), ()):
+                        if abs(z.x - spx) < 200 and abs(z.y - spy) < 200:
+                            nearby += 1
 
             if nearby >= sp.get("max_zombies", 5):
                 continue
@@ -204,23 +250,37 @@ class WorldChunk:
                 zombie.chunk_x = self.chunk_x
                 zombie.chunk_y = self.chunk_y
                 self.zombies[zombie.id] = zombie
+                # Later spawn points in this pass must count it too
+                zombie_grid.setdefault(_cell(zombie.x, zombie.y), []).append(zombie)
 
     def find_resource_near(self, x: float, y: float, radius: float = 50) -> Optional[ResourceNode]:
         """Find a collectible resource near given position"""
-        for node in self.resources.values():
-            if node.is_available:
-                dx = node.x - x
-                dy = node.y - y
-                if math.sqrt(dx * dx + dy * dy) < radius:
-                    return node
-        return None
+        r2 = radius * radius  # compare squared distances, no sqrt per node
+        span = int(radius // _GRID_CELL) + 1
+        bx, by = _cell(x, y)
+        grid = self._resource_grid
+        best = None
+        for gx in range(bx - span, bx + span + 1):
+            for gy in range(by - span, by + span + 1):
+                for node in grid.get((gx, gy), ()):
+                    # Lowest id wins, as with the old scan in insertion order
+                    if best is not None and node.id > best.id:
+                        continue
+                    if not node.is_available:
+                        continue
+                    dx = node.x - x
+                    dy = node.y - y
+                    if dx * dx + dy * dy < r2:
+                        best = node
+        return best
 
     def to_state(self) -> dict:
         """Serialize chunk data for sending to client"""
         return {
             "chunk_x": self.chunk_x,
             "chunk_y": self.chunk_y,
-            "terrain": self.terrain,
+            # Flat tile bytes, row-major; ~1.4 KB instead of a nested int grid
+            "terrain_b64": base64.b64encode(self.terrain).decode("ascii"),
             "resources": [r.to_state() for r in self.resources.values()],
             "buildings": self.buildings,
         }
@@ -1,15 +1,21 @@
 """
 Database operations for open world — load/save player state, chunks, zombies.
 """
+from dataclasses import dataclass
 from typing import Optional, Tuple
 from datetime import datetime, timezone
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, delete, insert, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from ...models import WorldState, PlayerInventory, MapChunk, WorldZombie, Clan, ClanMember, Building, BuildingType
 from ...database import async_session
-from .map_generator import map_generator, CHUNK_SIZE, TILE_SIZE
+from .map_generator import map_generator, CHUNK_SIZE, TILE_SIZE, terrain_from_grid, terrain_to_grid
+from .building_types import get_building_type_by_id
+from .clan_service import invalidate_clan_cache_by_id
+
+# Rows per INSERT batch when persisting a chunk's zombies
+ZOMBIE_INSERT_BATCH = 500
 
 
 async def get_or_create_world_state(player_id: int) -> dict:
@@ -30,8 +36,9 @@ async def get_or_create_world_state(player_id: int) -> dict:
                 hp=100, max_hp=100, is_alive=True
             )
             db.add(ws)
+            # Column defaults are client-side and land on the instance at
+            # flush, so no refresh SELECT is needed after commit
             await db.commit()
-            await db.refresh(ws)
 
         # Inventory
         result = await db.execute(
@@ -43,7 +50,6 @@ async def get_or_create_world_state(player_id: int) -> dict:
             inv = PlayerInventory(player_id=player_id)
             db.add(inv)
             await db.commit()
-            await db.refresh(inv)
 
         return {
             "x": ws.x,
@@ -67,56 +73,56 @@ async def save_world_state(player_id: int, x: float, y: float, hp: int,
                             is_alive: bool, inventory: dict, weapon_code: str,
                             clothing: dict = None):
     """Save player's world state to DB"""
+    # Blind UPDATEs: no SELECT first; missing rows are left alone as before
+    inv_values = {
+        "metal": inventory.get("metal", 0),
+        "wood": inventory.get("wood", 0),
+        "food": inventory.get("food", 0),
+        "ammo": inventory.get("ammo", 0),
+        "meds": inventory.get("meds", 0),
+        "equipped_weapon": weapon_code,
+    }
+    if clothing is not None:
+        inv_values["equipped_clothing"] = clothing
+
     async with async_session() as db:
-        result = await db.execute(
-            select(WorldState).where(WorldState.player_id == player_id)
+        await db.execute(
+            update(WorldState)
+            .where(WorldState.player_id == player_id)
+            .values(x=x, y=y, hp=hp, is_alive=is_alive)
+            .execution_options(synchronize_session=False)
         )
-        ws = result.scalar_one_or_none()
-        if ws:
-            ws.x = x
-            ws.y = y
-            ws.hp = hp
-            ws.is_alive = is_alive
-
-        result = await db.execute(
-            select(PlayerInventory).where(PlayerInventory.player_id == player_id)
+        await db.execute(
+            update(PlayerInventory)
+            .where(PlayerInventory.player_id == player_id)
+            .values(**inv_values)
+            .execution_options(synchronize_session=False)
         )
-        inv = result.scalar_one_or_none()
-        if inv:
-            inv.metal = inventory.get("metal", 0)
-            inv.wood = inventory.get("wood", 0)
-            inv.food = inventory.get("food", 0)
-            inv.ammo = inventory.get("ammo", 0)
-            inv.meds = inventory.get("meds", 0)
-            inv.equipped_weapon = weapon_code
-            if clothing is not None:
-                inv.equipped_clothing = clothing
-
         await db.commit()
 
 
-async def load_chunk_from_db(chunk_x: int, chunk_y: int) -> Optional[dict]:
+async def _load_chunk_from_db(db, chunk_x: int, chunk_y: int) -> Optional[dict]:
     """Load a chunk from DB. Returns None if not generated yet."""
-    async with async_session() as db:
-        result = await db.execute(
-            select(MapChunk).where(
-                MapChunk.chunk_x == chunk_x,
-                MapChunk.chunk_y == chunk_y
-            )
+    result = await db.execute(
+        select(MapChunk.terrain, MapChunk.resources, MapChunk.spawn_points, MapChunk.seed)
+        .where(
+            MapChunk.chunk_x == chunk_x,
+            MapChunk.chunk_y == chunk_y
         )
-        chunk = result.scalar_one_or_none()
-        if not chunk:
-            return None
+    )
+    chunk = result.one_or_none()
+    if not chunk:
+        return None
 
-        return {
-            "terrain": chunk.terrain,
-            "resources": chunk.resources or [],
-            "spawn_points": chunk.spawn_points or [],
-            "seed": chunk.seed,
-        }
+    return {
+        "terrain": terrain_from_grid(chunk.terrain),
+        "resources": chunk.resources or [],
+        "spawn_points": chunk.spawn_points or [],
+        "seed": chunk.seed,
+    }
 
 
-async def save_chunk_to_db(chunk_x: int, chunk_y: int, terrain: list,
+async def save_chunk_to_db(chunk_x: int, chunk_y: int, terrain: bytes,
                             resources: list, spawn_points: list, seed: int):
     """Save generated chunk to DB"""
     async with async_session() as db:
@@ -133,7 +139,7 @@ async def save_chunk_to_db(chunk_x: int, chunk_y: int, terrain: list,
         chunk = MapChunk(
             chunk_x=chunk_x,
             chunk_y=chunk_y,
-            terrain=terrain,
+            terrain=terrain_to_grid(terrain),  # JSON column keeps the [ty][tx] grid
             resources=resources,
             spawn_points=spawn_points,
             seed=seed,
@@ -142,26 +148,26 @@ async def save_chunk_to_db(chunk_x: int, chunk_y: int, terrain: list,
         await db.commit()
 
 
-async def load_chunk_zombies(chunk_x: int, chunk_y: int) -> list:
+async def _load_chunk_zombies(db, chunk_x: int, chunk_y: int) -> list:
     """Load alive zombies for a chunk from DB"""
-    async with async_session() as db:
-        result = await db.execute(
-            select(WorldZombie).where(
-                WorldZombie.chunk_x == chunk_x,
-                WorldZombie.chunk_y == chunk_y,
-                WorldZombie.is_alive == True
-            )
+    result = await db.execute(
+        select(WorldZombie.id, WorldZombie.x, WorldZombie.y, WorldZombie.zombie_type, WorldZombie.hp)
+        .where(
+            WorldZombie.chunk_x == chunk_x,
+            WorldZombie.chunk_y == chunk_y,
+            WorldZombie.is_alive == True
         )
-        zombies = []
-        for wz in result.scalars().all():
-            zombies.append({
-                "db_id": wz.id,
-                "x": wz.x,
-                "y": wz.y,
-                "type": wz.zombie_type,
-                "hp": wz.hp,
-            })
-        return zombies
+    )
+    return [
+        {
+            "db_id": wz.id,
+            "x": wz.x,
+            "y": wz.y,
+            "type": wz.zombie_type,
+            "hp": wz.hp,
+        }
+        for wz in result
+    ]
 
 
 def _find_clans_in_chunk(chunk_x: int, chunk_y: int):
@@ -177,59 +183,118 @@ def _find_clans_in_chunk(chunk_x: int, chunk_y: int):
     )
 
 
-async def load_clan_bases_for_chunk(chunk_x: int, chunk_y: int) -> list:
+async def _load_clan_bases_for_chunk(db, chunk_x: int, chunk_y: int) -> list:
     """Load clan base positions for clans whose base is in this chunk."""
-    async with async_session() as db:
-        result = await db.execute(
-            select(Clan).where(_find_clans_in_chunk(chunk_x, chunk_y))
+    result = await db.execute(
+        select(Clan.base_x, Clan.base_y).where(_find_clans_in_chunk(chunk_x, chunk_y))
+    )
+    return [{"x": c.base_x, "y": c.base_y} for c in result]
+
+
+async def _iter_chunk_buildings(db, chunk_x: int, chunk_y: int):
+    """Active buildings of every clan based in this chunk, with their clan's
+    base position and name, in one query. Yields (row, building_type)."""
+    result = await db.execute(
+        select(
+            Building.id, Building.clan_id, Building.building_type_id,
+            Building.grid_x, Building.grid_y, Building.hp,
+            Building.build_complete, Building.last_collected,
+            Clan.base_x, Clan.base_y, Clan.name.label("clan_name"),
         )
-        clans = result.scalars().all()
-        return [{"x": c.base_x, "y": c.base_y} for c in clans]
+        .join(Clan, Clan.id == Building.clan_id)
+        .where(_find_clans_in_chunk(chunk_x, chunk_y), Building.is_active == True)
+    )
+    for row in result:
+        bt = get_building_type_by_id(row.building_type_id)
+        if bt:
+            yield row, bt
+
+
+async def _load_chunk_structures(db, chunk_x: int, chunk_y: int) -> Tuple[list, list]:
+    """Buildings and built turrets for clans whose base is in this chunk,
+    both from the same query. Returns (buildings, turrets)."""
+    buildings = []
+    turrets = []
+    now = datetime.now(timezone.utc)
+    async for building, bt in _iter_chunk_buildings(db, chunk_x, chunk_y):
+        is_built = True
+        if building.build_complete:
+            is_built = building.build_complete.replace(tzinfo=timezone.utc) <= now
+
+        # Grid is 16x16 centered on clan base position
+        world_x = building.base_x - 8 * TILE_SIZE + building.grid_x * TILE_SIZE
+        world_y = building.base_y - 8 * TILE_SIZE + building.grid_y * TILE_SIZE
+
+        # last_collected timestamp for client-side production calc
+        lc_ts = None
+        if building.last_collected:
+            lc = building.last_collected
+            if lc.tzinfo is None:
+                lc_ts = lc.replace(tzinfo=timezone.utc).timestamp()
+            else:
+                lc_ts = lc.timestamp()
+
+        buildings.append({
+            "id": building.id,
+            "clan_id": building.clan_id,
+            "type_code": bt.code,
+            "type_name": bt.name,
+            "category": bt.category,
+            "x": world_x,
+            "y": world_y,
+            "width": bt.width * TILE_SIZE,
+            "height": bt.height * TILE_SIZE,
+            "hp": building.hp,
+            "max_hp": bt.max_hp,
+            "is_built": is_built,
+            "clan_name": building.clan_name,
+            "produces_resource": bt.produces_resource,
+            "production_rate": bt.production_rate,
+            "storage_capacity": bt.storage_capacity,
+            "last_collected_ts": lc_ts,
+        })
+
+        # Turrets: finished defense buildings that deal damage
+        if (bt.category == "defense" and bt.damage > 0
+                and building.build_complete is not None and is_built):
+            turrets.append({
+                "id": building.id,
+                "x": world_x + (bt.width * TILE_SIZE) / 2,
+                "y": world_y + (bt.height * TILE_SIZE) / 2,
+                "damage": bt.damage,
+                "fire_rate": bt.fire_rate,
+                "attack_range": bt.attack_range,
+                "type_code": bt.code,
+            })
+
+    return buildings, turrets
 
 
-async def load_turrets_for_chunk(chunk_x: int, chunk_y: int) -> list:
-    """Load built turrets for clans whose base is at this chunk."""
+async def load_chunk_structures(chunk_x: int, chunk_y: int) -> Tuple[list, list]:
+    """Load (buildings, turrets) for clans whose base is in this chunk."""
     async with async_session() as db:
-        result = await db.execute(
-            select(Clan).where(_find_clans_in_chunk(chunk_x, chunk_y))
-        )
-        clans = result.scalars().all()
-        if not clans:
-            return []
-
-        turrets = []
-        now = datetime.now(timezone.utc)
-        for clan in clans:
-            result = await db.execute(
-                select(Building).where(
-                    Building.clan_id == clan.id,
-                    Building.is_active == True
-                ).options(selectinload(Building.building_type))
-            )
-            for building in result.scalars().all():
-                bt = building.building_type
-                if not bt or bt.category != "defense" or bt.damage <= 0:
-                    continue
-                if building.build_complete is None:
-                    continue
-                if building.build_complete.replace(tzinfo=timezone.utc) > now:
-                    continue
-
-                # Grid is 16x16 centered on clan base position
-                world_x = clan.base_x - 8 * TILE_SIZE + building.grid_x * TILE_SIZE + (bt.width * TILE_SIZE) / 2
-                world_y = clan.base_y - 8 * TILE_SIZE + building.grid_y * TILE_SIZE + (bt.height * TILE_SIZE) / 2
-
-                turrets.append({
-                    "id": building.id,
-                    "x": world_x,
-                    "y": world_y,
-                    "damage": bt.damage,
-                    "fire_rate": bt.fire_rate,
-                    "attack_range": bt.attack_range,
-                    "type_code": bt.code,
-                })
-
-        return turrets
+        return await _load_chunk_structures(db, chunk_x, chunk_y)
+
+
+@dataclass
+class ChunkBundle:
+    """Everything persisted for one chunk, read when it activates"""
+    chunk: Optional[dict]  # None if the chunk was never generated
+    zombies: list
+    buildings: list
+    turrets: list
+    clan_bases: list
+
+
+async def load_chunk_bundle(chunk_x: int, chunk_y: int) -> ChunkBundle:
+    """Load chunk data, zombies, buildings, turrets and clan bases using
+    one session (one pooled connection) instead of one per loader."""
+    async with async_session() as db:
+        chunk = await _load_chunk_from_db(db, chunk_x, chunk_y)
+        zombies = await _load_chunk_zombies(db, chunk_x, chunk_y)
+        buildings, turrets = await _load_chunk_structures(db, chunk_x, chunk_y)
+        clan_bases = await _load_clan_bases_for_chunk(db, chunk_x, chunk_y)
+    return ChunkBundle(chunk, zombies, buildings, turrets, clan_bases)
 
 
 async def get_player_clan_base(player_id: int, online_player_ids: set = None) -> Optional[dict]:
@@ -273,25 +338,21 @@ async def get_player_clan_base(player_id: int, online_player_ids: set = None) ->
 
 async def deposit_player_resources(player_id: int, world_player, safe_zone_radius: float) -> Optional[dict]:
     """Deposit all player resources to their clan base if they are near it."""
-    import math
     async with async_session() as db:
-        # Get player's clan
+        # Get player's clan base (only the columns the gate needs)
         result = await db.execute(
-            select(ClanMember)
-            .options(selectinload(ClanMember.clan))
+            select(Clan.id, Clan.base_x, Clan.base_y)
+            .join(ClanMember, ClanMember.clan_id == Clan.id)
             .where(ClanMember.player_id == player_id)
         )
-        membership = result.scalar_one_or_none()
-        if not membership or not membership.clan:
+        clan = result.one_or_none()
+        if not clan:
             return None
 
-        clan = membership.clan
-
-        # Check proximity
+        # Check proximity (squared, no sqrt)
         dx = clan.base_x - world_player.x
         dy = clan.base_y - world_player.y
-        dist = math.sqrt(dx * dx + dy * dy)
-        if dist > safe_zone_radius:
+        if dx * dx + dy * dy > safe_zone_radius * safe_zone_radius:
             return None
 
         # Collect amounts to deposit
@@ -303,12 +364,20 @@ async def deposit_player_resources(player_id: int, world_player, safe_zone_radiu
             "meds": world_player.meds,
         }
 
-        # Transfer to clan
-        clan.metal += world_player.metal
-        clan.wood += world_player.wood
-        clan.food += world_player.food
-        clan.ammo += world_player.ammo_inv
-        clan.meds += world_player.meds
+        # Transfer to clan: atomic increments, so concurrent deposits
+        # into the same clan can't overwrite each other
+        await db.execute(
+            update(Clan)
+            .where(Clan.id == clan.id)
+            .values(
+                metal=Clan.metal + deposited["metal"],
+                wood=Clan.wood + deposited["wood"],
+                food=Clan.food + deposited["food"],
+                ammo=Clan.ammo + deposited["ammo"],
+                meds=Clan.meds + deposited["meds"],
+            )
+            .execution_options(synchronize_session=False)
+        )
 
         # Clear player inventory
         world_player.metal = 0
@@ -318,98 +387,35 @@ async def deposit_player_resources(player_id: int, world_player, safe_zone_radiu
         world_player.meds = 0
 
         await db.commit()
+        await invalidate_clan_cache_by_id(db, clan.id)
         return deposited
 
 
-async def load_buildings_for_chunk(chunk_x: int, chunk_y: int) -> list:
-    """Load all buildings for clans whose base is in this chunk."""
-    async with async_session() as db:
-        result = await db.execute(
-            select(Clan).where(_find_clans_in_chunk(chunk_x, chunk_y))
-        )
-        clans = result.scalars().all()
-        if not clans:
-            return []
-
-        buildings = []
-        now = datetime.now(timezone.utc)
-        for clan in clans:
-            result = await db.execute(
-                select(Building).where(
-                    Building.clan_id == clan.id,
-                    Building.is_active == True
-                ).options(selectinload(Building.building_type))
-            )
-            for building in result.scalars().all():
-                bt = building.building_type
-                if not bt:
-                    continue
-
-                is_built = True
-                if building.build_complete:
-                    is_built = building.build_complete.replace(tzinfo=timezone.utc) <= now
-
-                # Grid is 16x16 centered on clan base position
-                world_x = clan.base_x - 8 * TILE_SIZE + building.grid_x * TILE_SIZE
-                world_y = clan.base_y - 8 * TILE_SIZE + building.grid_y * TILE_SIZE
-
-                # last_collected timestamp for client-side production calc
-                lc_ts = None
-                if building.last_collected:
-                    lc = building.last_collected
-                    if lc.tzinfo is None:
-                        lc_ts = lc.replace(tzinfo=timezone.utc).timestamp()
-                    else:
-                        lc_ts = lc.timestamp()
-
-                buildings.append({
-                    "id": building.id,
-                    "clan_id": clan.id,
-                    "type_code": bt.code,
-                    "type_name": bt.name,
-                    "category": bt.category,
-                    "x": world_x,
-                    "y": world_y,
-                    "width": bt.width * TILE_SIZE,
-                    "height": bt.height * TILE_SIZE,
-                    "hp": building.hp,
-                    "max_hp": bt.max_hp,
-                    "is_built": is_built,
-                    "clan_name": clan.name,
-                    "produces_resource": bt.produces_resource,
-                    "production_rate": bt.production_rate,
-                    "storage_capacity": getattr(bt, 'storage_capacity', 0),
-                    "last_collected_ts": lc_ts,
-                })
-
-        return buildings
-
-
 async def save_chunk_zombies(chunk_x: int, chunk_y: int, zombies: list):
     """Save zombies in a chunk to DB (for persistence when chunk unloads)"""
     async with async_session() as db:
-        # Delete existing zombies in this chunk
-        result = await db.execute(
-            select(WorldZombie).where(
+        # Replace the chunk's rows: one DELETE, then batched executemany INSERTs
+        await db.execute(
+            delete(WorldZombie).where(
                 WorldZombie.chunk_x == chunk_x,
                 WorldZombie.chunk_y == chunk_y
             )
         )
-        for wz in result.scalars().all():
-            await db.delete(wz)
-
-        # Save current zombies
-        for z in zombies:
-            wz = WorldZombie(
-                x=z["x"],
-                y=z["y"],
-                chunk_x=chunk_x,
-                chunk_y=chunk_y,
-                zombie_type=z["type"],
-                hp=z["hp"],
-                max_hp=z["max_hp"],
-                is_alive=True,
-            )
-            db.add(wz)
+
+        rows = [
+            {
+                "x": z["x"],
+                "y": z["y"],
+                "chunk_x": chunk_x,
+                "chunk_y": chunk_y,
+                "zombie_type": z["type"],
+                "hp": z["hp"],
+                "max_hp": z["max_hp"],
+                "is_alive": True,
+            }
+            for z in zombies
+        ]
+        for start in range(0, len(rows), ZOMBIE_INSERT_BATCH):
+            await db.execute(insert(WorldZombie), rows[start:start + ZOMBIE_INSERT_BATCH])
 
         await db.commit()
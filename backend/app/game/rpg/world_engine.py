@@ -6,6 +6,8 @@ import asyncio
 import math
 import random
 import time
+from contextlib import AsyncExitStack
+from math import cos as _cos, sin as _sin
 from typing import Dict, List, Optional, Set, Tuple
 from fastapi import WebSocket
 
@@ -14,7 +16,9 @@ from .world_zombie_entity import WorldZombieEntity
 from .world_chunk import WorldChunk
 from .map_generator import map_generator, CHUNK_SIZE, TILE_SIZE, TILE_WATER, TILE_ROCK
 from . import world_db
-from .clothing import generate_clothing_drop, CLOTHING_ITEMS
+from .clothing import generate_clothing_drop, code_of, CLOTHING_ID, CLOTHING_NAMES, CLOTHING_RARITY
+from .base_grid import clan_grid_lock, invalidate_clan_occupancy
+from .clan_service import invalidate_clan_cache_by_id
 from ..collision import distance, line_circle_intersection, normalize
 
 
@@ -34,8 +38,8 @@ class WorldProjectile:
         self.remaining_damage = weapon["damage"]
         self.hit_zombies: set = set()
 
-        self.vx = math.cos(angle) * self.speed
-        self.vy = math.sin(angle) * self.speed
+        self.vx = _cos(angle) * self.speed
+        self.vy = _sin(angle) * self.speed
         self.lifetime = 2.0  # seconds
 
     def update(self, dt: float) -> bool:
@@ -428,9 +432,10 @@ class WorldEngine:
                             loot = self._generate_loot(zombie.type)
 
                             # Clothing drop
-                            clothing_code = generate_clothing_drop(zombie.type)
+                            clothing_id = generate_clothing_drop(zombie.type)
                             clothing_drop = None
-                            if clothing_code:
+                            if clothing_id is not None:
+                                clothing_code = code_of(clothing_id)
                                 drop_id = self._next_drop_id
                                 self._next_drop_id += 1
                                 self.ground_drops[drop_id] = {
@@ -443,7 +448,7 @@ class WorldEngine:
                                 clothing_drop = {
                                     "id": drop_id,
                                     "code": clothing_code,
-                                    "name": CLOTHING_ITEMS[clothing_code]["name"],
+                                    "name": CLOTHING_NAMES[clothing_id],
                                 }
 
                             events.append({
@@ -538,16 +543,28 @@ class WorldEngine:
         from sqlalchemy import select
 
         if self._walls_to_destroy:
+            # Swap the queue out first so walls destroyed during the awaits
+            # below are kept for the next sync
+            wall_ids, self._walls_to_destroy = self._walls_to_destroy, []
             async with async_session() as db:
-                for wall_id in self._walls_to_destroy:
-                    result = await db.execute(
-                        select(Building).where(Building.id == wall_id)
-                    )
-                    building = result.scalar_one_or_none()
-                    if building:
+                result = await db.execute(
+                    select(Building).where(Building.id.in_(wall_ids))
+                )
+                buildings = result.scalars().all()
+                destroyed_clans = sorted({b.clan_id for b in buildings})
+                # Hold the grid locks of every affected clan (in id order) across
+                # delete + commit + invalidate so a concurrent occupancy load
+                # cannot cache the pre-delete layout.
+                async with AsyncExitStack() as stack:
+                    for clan_id in destroyed_clans:
+                        await stack.enter_async_context(clan_grid_lock(clan_id))
+                    for building in buildings:
                         await db.delete(building)
-                await db.commit()
-            self._walls_to_destroy.clear()
+                    await db.commit()
+                    for clan_id in destroyed_clans:
+                        invalidate_clan_occupancy(clan_id)
+                for clan_id in destroyed_clans:
+                    await invalidate_clan_cache_by_id(db, clan_id)
 
         # Notify clients about building updates for affected chunks
         for ck in self._walls_dirty_chunks:
@@ -677,11 +694,9 @@ class WorldEngine:
                 if rate <= 0 or cap <= 0:
                     continue
 
-                hours = (now - b['last_collected_ts']) / 3600
-                fill = (hours * rate) / cap
-
                 bld_id = b['id']
-                if fill >= 1.0:
+                # Full once produced resource-seconds reach capacity * 1h
+                if (now - b['last_collected_ts']) * rate >= cap * 3600:
                     if bld_id not in self._notified_storage:
                         self._notified_storage.add(bld_id)
                         clan_id = b.get('clan_id')
@@ -713,7 +728,6 @@ class WorldEngine:
                 await self._load_chunk(ck[0], ck[1])
 
         # Mark empty chunks for unload
-        import time
         now = time.time()
         for ck in list(self.chunks.keys()):
             if ck not in needed:
@@ -723,7 +737,6 @@ class WorldEngine:
                 self._chunk_empty_since.pop(ck, None)
 
     async def _unload_stale_chunks(self):
-        import time
         now = time.time()
         to_unload = [
             ck for ck, since in self._chunk_empty_since.items()
@@ -746,7 +759,9 @@ class WorldEngine:
 
     async def _load_chunk(self, chunk_x: int, chunk_y: int):
         """Load chunk from DB or generate new one."""
-        db_data = await world_db.load_chunk_from_db(chunk_x, chunk_y)
+        # Chunk row, zombies, buildings, turrets and clan bases in one session
+        bundle = await world_db.load_chunk_bundle(chunk_x, chunk_y)
+        db_data = bundle.chunk
 
         if db_data:
             chunk = WorldChunk(
@@ -756,7 +771,8 @@ class WorldEngine:
             )
         else:
             # Generate new chunk
-            gen_data = map_generator.generate_chunk(chunk_x, chunk_y)
+            # CPU-bound; keep the event loop (and the tick) responsive
+            gen_data = await asyncio.to_thread(map_generator.generate_chunk, chunk_x, chunk_y)
             chunk = WorldChunk(
                 chunk_x, chunk_y,
                 gen_data["terrain"], gen_data["resources"],
@@ -769,17 +785,16 @@ class WorldEngine:
                 gen_data["spawn_points"], gen_data["seed"]
             )
 
-        # Load persisted zombies
-        db_zombies = await world_db.load_chunk_zombies(chunk_x, chunk_y)
-        for zd in db_zombies:
+        # Restore persisted zombies
+        for zd in bundle.zombies:
             zombie = WorldZombieEntity(zd["type"], zd["x"], zd["y"], db_id=zd["db_id"])
             zombie.hp = zd["hp"]
             zombie.chunk_x = chunk_x
             zombie.chunk_y = chunk_y
             chunk.zombies[zombie.id] = zombie
 
-        # Load buildings for this chunk (if a clan base is here)
-        buildings_data = await world_db.load_buildings_for_chunk(chunk_x, chunk_y)
+        # Buildings for this chunk (if a clan base is here)
+        buildings_data = bundle.buildings
         chunk.buildings = buildings_data
 
         # Map building_id -> clan_id for gate logic
@@ -789,8 +804,8 @@ class WorldEngine:
 
         self.chunks[(chunk_x, chunk_y)] = chunk
 
-        # Load turrets for this chunk (if a clan base is here)
-        turret_data = await world_db.load_turrets_for_chunk(chunk_x, chunk_y)
+        # Turrets for this chunk (if a clan base is here)
+        turret_data = bundle.turrets
         if turret_data:
             self.turrets[(chunk_x, chunk_y)] = [
                 WorldTurret(
@@ -800,9 +815,8 @@ class WorldEngine:
                 for td in turret_data
             ]
 
-        # Load clan bases for safe zone enforcement
-        clan_bases = await world_db.load_clan_bases_for_chunk(chunk_x, chunk_y)
-        for cb in clan_bases:
+        # Clan bases for safe zone enforcement
+        for cb in bundle.clan_bases:
             pos = (cb["x"], cb["y"])
             if pos not in self.safe_zones:
                 self.safe_zones.append(pos)
@@ -916,14 +930,14 @@ class WorldEngine:
             dcx = int(math.floor(d["x"] / CHUNK_SIZE))
             dcy = int(math.floor(d["y"] / CHUNK_SIZE))
             if (dcx, dcy) in visible_chunks:
-                info = CLOTHING_ITEMS.get(d["code"], {})
+                item_id = CLOTHING_ID.get(d["code"])
                 visible_drops.append({
                     "id": d["id"],
                     "code": d["code"],
                     "x": d["x"],
                     "y": d["y"],
-                    "name": info.get("name", d["code"]),
-                    "rarity": info.get("rarity", "common"),
+                    "name": CLOTHING_NAMES[item_id] if item_id is not None else d["code"],
+                    "rarity": CLOTHING_RARITY[item_id] if item_id is not None else "common",
                 })
 
         # Filter events relevant to this player
@@ -945,7 +959,7 @@ class WorldEngine:
         if player._broken_items:
             player_events.append({
                 "type": "clothing_broken",
-                "items": [{"code": c, "name": CLOTHING_ITEMS.get(c, {}).get("name", c)}
+                "items": [{"code": c, "name": CLOTHING_NAMES[CLOTHING_ID[c]] if c in CLOTHING_ID else c}
                           for c in player._broken_items],
             })
             player._broken_items.clear()
@@ -989,12 +1003,10 @@ class WorldEngine:
         if not chunk:
             return
 
-        # Reload buildings from DB
-        buildings_data = await world_db.load_buildings_for_chunk(cx, cy)
+        # Reload buildings and turrets from DB (one query)
+        buildings_data, turret_data = await world_db.load_chunk_structures(cx, cy)
         chunk.buildings = buildings_data
 
-        # Reload turrets from DB
-        turret_data = await world_db.load_turrets_for_chunk(cx, cy)
         if turret_data:
             self.turrets[(cx, cy)] = [
                 WorldTurret(
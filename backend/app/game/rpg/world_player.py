@@ -9,13 +9,16 @@ from ..weapons import get_weapon, get_starter_weapon
 from ..collision import clamp, normalize
 
 from .map_generator import CHUNK_SIZE, TILE_SIZE, TILES_PER_CHUNK, TILE_WATER, TILE_ROCK
-from .clothing import CLOTHING_ITEMS
+from .clothing import (
+    CLOTHING_ID, CLOTHING_SLOTS, CLOTHING_NAMES, CLOTHING_ARMOR, CLOTHING_MAX_DURABILITY,
+)
 
 
 class WorldPlayer:
     SPEED = 180  # pixels per second (slightly slower in open world)
     MAX_HP = 100
     RESPAWN_TIME = 5.0
+    RESPAWN_NS = int(RESPAWN_TIME * 1_000_000_000)
     PLAYER_SIZE = 20
     VIEW_RANGE = 1  # sees 3x3 chunks (current ± 1)
 
@@ -31,7 +34,7 @@ class WorldPlayer:
         self.hp = self.MAX_HP
         self.max_hp = self.MAX_HP
         self.is_dead = False
-        self.death_time = 0.0
+        self.death_time_ns = 0
 
         # Ready flag — skip state broadcasts until client received world_entered
         self.ws_ready = False
@@ -214,7 +217,7 @@ class WorldPlayer:
         if self.hp <= 0:
             self.hp = 0
             self.is_dead = True
-            self.death_time = time.time()
+            self.death_time_ns = time.monotonic_ns()
             return True
         return False
 
@@ -229,7 +232,7 @@ class WorldPlayer:
     def can_respawn(self) -> bool:
         if not self.is_dead:
             return False
-        return time.time() - self.death_time >= self.RESPAWN_TIME
+        return time.monotonic_ns() - self.death_time_ns >= self.RESPAWN_NS
 
     def switch_weapon(self, weapon_code: str):
         from ..weapons import WEAPONS
@@ -266,29 +269,29 @@ class WorldPlayer:
 
     def get_total_armor(self) -> float:
         return sum(
-            CLOTHING_ITEMS[item["code"]]["armor"]
+            CLOTHING_ARMOR[CLOTHING_ID[item["code"]]]
             for item in self.clothing.values() if item
         )
 
     def equip_clothing(self, code: str) -> dict:
-        info = CLOTHING_ITEMS.get(code)
-        if not info:
+        item_id = CLOTHING_ID.get(code)
+        if item_id is None:
             return {"equipped": None}
-        slot = info["slot"]
+        slot = CLOTHING_SLOTS[item_id]
         replaced = None
         old = self.clothing.get(slot)
         if old:
             replaced = old["code"]
-        self.clothing[slot] = {"code": code, "durability": info["max_durability"]}
+        self.clothing[slot] = {"code": code, "durability": CLOTHING_MAX_DURABILITY[item_id]}
         return {"equipped": code, "slot": slot, "replaced": replaced,
-                "name": info["name"]}
+                "name": CLOTHING_NAMES[item_id]}
 
     def unequip_clothing(self, slot: str) -> dict:
         item = self.clothing.get(slot)
         if not item:
             return {"unequipped": None, "slot": slot}
         code = item["code"]
-        name = CLOTHING_ITEMS[code]["name"]
+        name = CLOTHING_NAMES[CLOTHING_ID[code]]
         self.clothing[slot] = None
         return {"unequipped": code, "slot": slot, "name": name}
 
@@ -296,12 +299,12 @@ class WorldPlayer:
         result = {}
         for slot, item in self.clothing.items():
             if item:
-                info = CLOTHING_ITEMS[item["code"]]
+                item_id = CLOTHING_ID[item["code"]]
                 result[slot] = {
                     "code": item["code"],
                     "durability": item["durability"],
-                    "max_durability": info["max_durability"],
-                    "name": info["name"],
+                    "max_durability": CLOTHING_MAX_DURABILITY[item_id],
+                    "name": CLOTHING_NAMES[item_id],
                 }
             else:
                 result[slot] = None
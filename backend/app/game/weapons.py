@@ -1,6 +1,12 @@
 """
 Weapon definitions with real-world models and prices.
 """
+import math
+import random
+from typing import Dict, List, Tuple
+
+SPREAD_TABLE_SIZE = 4096  # power of two so cursors wrap with a mask
+SPREAD_TABLE_MASK = SPREAD_TABLE_SIZE - 1
 
 WEAPONS = {
     # --- Pistols ---
@@ -224,6 +230,22 @@ def get_weapon(code: str) -> dict:
     return WEAPONS.get(code, WEAPONS["glock_17"])
 
 
+_spread_tables: Dict[str, List[Tuple[float, float, float]]] = {}
+
+
+def get_spread_table(code: str) -> List[Tuple[float, float, float]]:
+    """Cyclic table of (offset, cos, sin) spread samples for a weapon, built on first use"""
+    table = _spread_tables.get(code)
+    if table is None:
+        spread = get_weapon(code)["spread"]
+        table = []
+        for _ in range(SPREAD_TABLE_SIZE):
+            d = random.uniform(-spread, spread)
+            table.append((d, math.cos(d), math.sin(d)))
+        _spread_tables[code] = table
+    return table
+
+
 def get_starter_weapon() -> str:
     """Return the starter weapon code"""
     return "glock_17"
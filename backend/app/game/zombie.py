@@ -1,19 +1,23 @@
 """
 Zombie entity and spawning logic.
 """
+import itertools
 import math
 import random
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, Iterable, Tuple
 from .wave import ZOMBIE_TYPES
-from .collision import distance, normalize
 
 
 class ZombieEntity:
-    _next_id = 1
+    __slots__ = (
+        "id", "type", "x", "y", "hp", "max_hp", "speed", "damage", "coins", "size",
+        "target_id", "attack_cooldown", "slot",
+    )
+
+    _ids = itertools.count(1)
 
     def __init__(self, zombie_type: str, x: float, y: float):
-        self.id = ZombieEntity._next_id
-        ZombieEntity._next_id += 1
+        self.id = next(ZombieEntity._ids)
 
         self.type = zombie_type
         self.x = x
@@ -32,7 +36,10 @@ class ZombieEntity:
         self.target_id: Optional[int] = None
         self.attack_cooldown = 0.0
 
-    def update(self, dt: float, players: List['PlayerEntity']) -> Optional[int]:
+        # Dense per-room index, assigned by Room when the zombie spawns
+        self.slot = 0
+
+    def update(self, dt: float, players: Iterable['PlayerEntity']) -> Optional[int]:
         """
         Update zombie AI. Returns player ID if attacking, None otherwise.
         """
@@ -40,16 +47,19 @@ class ZombieEntity:
         if self.attack_cooldown > 0:
             self.attack_cooldown -= dt
 
-        # Find nearest alive player
+        # Find nearest alive player (squared distances - one sqrt per tick)
         nearest_player = None
-        nearest_dist = float('inf')
+        nearest_dist_sq = float('inf')
+        x, y = self.x, self.y
 
         for player in players:
             if player.is_dead:
                 continue
-            d = distance(self.x, self.y, player.x, player.y)
-            if d < nearest_dist:
-                nearest_dist = d
+            dx = player.x - x
+            dy = player.y - y
+            d_sq = dx * dx + dy * dy
+            if d_sq < nearest_dist_sq:
+                nearest_dist_sq = d_sq
                 nearest_player = player
 
         if not nearest_player:
@@ -58,6 +68,7 @@ class ZombieEntity:
         self.target_id = nearest_player.id
 
         # Check if close enough to attack
+        nearest_dist = math.sqrt(nearest_dist_sq)
         attack_range = self.size + nearest_player.PLAYER_SIZE
         if nearest_dist < attack_range:
             # Attack
@@ -65,13 +76,10 @@ class ZombieEntity:
                 self.attack_cooldown = 1.0  # Attack once per second
                 return nearest_player.id
         else:
-            # Move towards player
-            dx = nearest_player.x - self.x
-            dy = nearest_player.y - self.y
-            nx, ny = normalize(dx, dy)
-
-            self.x += nx * self.speed * dt
-            self.y += ny * self.speed * dt
+            # Move towards player (dist >= attack_range > 0)
+            step = self.speed * dt / nearest_dist
+            self.x = x + (nearest_player.x - x) * step
+            self.y = y + (nearest_player.y - y) * step
 
         return None
 
@@ -85,8 +93,8 @@ class ZombieEntity:
         return {
             "id": self.id,
             "type": self.type,
-            "x": round(self.x, 1),
-            "y": round(self.y, 1),
+            "x": round(self.x * 10) / 10,
+            "y": round(self.y * 10) / 10,
             "hp": self.hp,
             "max_hp": self.max_hp,
             "size": self.size  # Send hitbox size for accurate visual rendering
@@ -11,11 +11,12 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-import redis.asyncio as redis
 
-from .database import init_db, get_db
+from .cache import redis_client
+from .database import init_db, get_db, get_pool_stats
 from .models import Player, Weapon, PlayerWeapon
 from .auth import validate_telegram_data
 from .game.engine import engine
@@ -28,21 +29,14 @@ from .rewards.star_scheduler import star_scheduler
 
 # Telegram Bot Token for payments
 BOT_TOKEN = os.getenv("BOT_TOKEN", "")
-
-
-# Redis for additional state if needed
-REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
-redis_client: Optional[redis.Redis] = None
+ADMIN_TELEGRAM_ID = int(os.getenv("ADMIN_TELEGRAM_ID") or 0)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
-    global redis_client
-
     # Startup
     await init_db()
-    redis_client = await redis.from_url(REDIS_URL)
     await seed_weapons()
     await _seed_building_types()
     await engine.start()
@@ -78,8 +72,7 @@ async def lifespan(app: FastAPI):
     await star_scheduler.stop()
     await world_engine.stop()
     await engine.stop()
-    if redis_client:
-        await redis_client.close()
+    await redis_client.close()
 
 
 app = FastAPI(title="VELLA", lifespan=lifespan)
@@ -861,7 +854,7 @@ async def websocket_endpoint(
                     if player:
                         player.add_kill(zombie.coins)
                     room.total_kills += 1
-                room.zombies.clear()
+                room.clear_zombies()
                 print(f"[DEBUG] Killed all {killed_count} zombies in room {room.room_code}")
 
             elif msg_type == "leave_room" and room:
@@ -990,3 +983,19 @@ async def list_all_rooms():
         }
         for room in engine.room_manager.rooms.values()
     ]
+
+
+@app.get("/metrics/db-pool", response_class=PlainTextResponse, include_in_schema=False)
+async def db_pool_metrics(init_data: str = Query(...)):
+    """DB connection pool gauges in Prometheus text format (admin only)"""
+    user_data = validate_telegram_data(init_data)
+    if not user_data:
+        raise HTTPException(status_code=401, detail="Invalid auth")
+    # With ADMIN_TELEGRAM_ID unset nobody gets through
+    if not ADMIN_TELEGRAM_ID or user_data.get("id") != ADMIN_TELEGRAM_ID:
+        raise HTTPException(status_code=403, detail="Admin only")
+
+    return "".join(
+        f"vella_db_pool_{name} {value}\n"
+        for name, value in get_pool_stats().items()
+    )
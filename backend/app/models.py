@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, Text, JSON
+from sqlalchemy import Column, BigInteger, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, Text, JSON, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -57,6 +57,7 @@ class ClanMember(Base):
 
     __table_args__ = (
         Index('idx_clan_member', 'clan_id', 'player_id', unique=True),
+        Index('idx_clan_member_player', 'player_id'),  # lookups by player alone
     )
 
 
@@ -82,7 +83,9 @@ class JoinRequest(Base):
     player = relationship("Player")
 
     __table_args__ = (
-        Index('idx_join_request_pending', 'clan_id', 'player_id', 'status'),
+        # Не больше одной ожидающей заявки на игрока в клан
+        Index('uq_join_request_pending', 'clan_id', 'player_id', unique=True,
+              postgresql_where=text("status = 'pending'")),
     )
 
 
@@ -9,6 +9,7 @@ from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from sqlalchemy import select, desc
 
+from ..bot.callbacks import StarsConfirmCB
 from ..database import async_session
 from ..models import Player, StarRewardLog
 
@@ -138,7 +139,10 @@ class StarScheduler:
                 buttons.append([
                     InlineKeyboardButton(
                         text=f"✅ {name} — {amount}⭐",
-                        callback_data=f"stars_confirm:{log.id}:{player.telegram_id}:{amount}",
+                        callback_data=StarsConfirmCB(
+                            log_id=log.id, player_id=player.telegram_id, amount=amount,
+                            row=len(buttons),
+                        ).pack(),
                     )
                 ])
 
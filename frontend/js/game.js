@@ -5,6 +5,11 @@
 
 import { DualJoystick } from './ui/Joystick.js';
 
+// Projectiles arrive as compact [id, x, y, angle, owner_id] arrays
+function unpackProjectile(p) {
+    return { id: p[0], x: p[1], y: p[2], angle: p[3], owner_id: p[4] };
+}
+
 export class GameManager {
     constructor(initialData) {
         this.initialData = initialData;
@@ -362,8 +367,6 @@ export class GameManager {
             return;
         }
 
-        this.currentWave = state.wave;
-
         // Update players
         for (const playerData of state.players) {
             if (this.players[playerData.id]) {
@@ -402,7 +405,8 @@ export class GameManager {
         }
 
         // Update projectiles
-        for (const projData of state.projectiles) {
+        const projectiles = state.projectiles.map(unpackProjectile);
+        for (const projData of projectiles) {
             if (this.projectiles[projData.id]) {
                 this.updateProjectile(projData);
             } else {
@@ -411,13 +415,61 @@ export class GameManager {
         }
 
         // Remove old projectiles
-        const activeProjIds = new Set(state.projectiles.map(p => p.id));
+        const activeProjIds = new Set(projectiles.map(p => p.id));
         for (const id of Object.keys(this.projectiles)) {
             if (!activeProjIds.has(parseInt(id))) {
                 this.removeProjectile(parseInt(id));
             }
         }
 
+        this.applyStateMeta(state);
+    }
+
+    applyStateDelta(delta) {
+        if (!this.scene) {
+            return;
+        }
+
+        // Delta carries only entities that changed since the last broadcast
+        for (const playerData of delta.players) {
+            if (this.players[playerData.id]) {
+                this.updatePlayer(playerData);
+            } else {
+                this.createPlayer(playerData);
+            }
+        }
+        for (const id of delta.removed_players) {
+            this.removePlayer(id);
+        }
+
+        for (const zombieData of delta.zombies) {
+            if (this.zombies[zombieData.id]) {
+                this.updateZombie(zombieData);
+            } else {
+                this.createZombie(zombieData);
+            }
+        }
+        for (const id of delta.removed_zombies) {
+            this.removeZombie(id);
+        }
+
+        for (const projData of delta.projectiles.map(unpackProjectile)) {
+            if (this.projectiles[projData.id]) {
+                this.updateProjectile(projData);
+            } else {
+                this.createProjectile(projData);
+            }
+        }
+        for (const id of delta.removed_projectiles) {
+            this.removeProjectile(id);
+        }
+
+        this.applyStateMeta(delta);
+    }
+
+    applyStateMeta(state) {
+        this.currentWave = state.wave;
+
         // Update HUD
         document.getElementById('hud-wave').textContent = state.wave;
         document.getElementById('hud-zombies').textContent = state.zombies_remaining;
@@ -4,8 +4,8 @@
  */
 
 import { WebSocketManager } from './network/WebSocketManager.js?v=28';
-import { GameManager } from './game.js?v=28';
-import { WorldGameManager } from './world.js?v=28';
+import { GameManager } from './game.js?v=30';
+import { WorldGameManager } from './world.js?v=29';
 import { BaseManager } from './base.js?v=28';
 import { UIManager } from './ui/UIManager.js?v=28';
 
@@ -508,6 +508,12 @@ function setupRoomHandlers() {
         }
     });
 
+    window.VELLA.ws.on('state_delta', (data) => {
+        if (window.VELLA.game) {
+            window.VELLA.game.applyStateDelta(data);
+        }
+    });
+
     window.VELLA.ws.on('wave_start', (data) => {
         hideScreen('wave-complete');
         hideScreen('shop-screen');
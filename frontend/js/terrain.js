@@ -184,6 +184,7 @@ export class TileTextureGenerator {
 
     // ===== Chunk rendering =====
 
+    // terrain: flat Uint8Array of tile types, row-major
     renderChunk(terrain, seed) {
         const canvas = document.createElement('canvas');
         canvas.width = CHUNK_SIZE;
@@ -193,7 +194,7 @@ export class TileTextureGenerator {
         // Pass 1: stamp base terrain tiles
         for (let ty = 0; ty < TILES_PER_CHUNK; ty++) {
             for (let tx = 0; tx < TILES_PER_CHUNK; tx++) {
-                const tileType = terrain[ty][tx];
+                const tileType = terrain[ty * TILES_PER_CHUNK + tx];
                 const px = tx * TILE_SIZE;
                 const py = ty * TILE_SIZE;
 
@@ -210,7 +211,7 @@ export class TileTextureGenerator {
         // Pass 2: stamp decorations on top
         for (let ty = 0; ty < TILES_PER_CHUNK; ty++) {
             for (let tx = 0; tx < TILES_PER_CHUNK; tx++) {
-                const tileType = terrain[ty][tx];
+                const tileType = terrain[ty * TILES_PER_CHUNK + tx];
                 const px = tx * TILE_SIZE;
                 const py = ty * TILE_SIZE;
 
@@ -4,7 +4,7 @@
  */
 
 import { DualJoystick } from './ui/Joystick.js?v=28';
-import { TileTextureGenerator } from './terrain.js?v=28';
+import { TileTextureGenerator } from './terrain.js?v=29';
 
 const TILE_SIZE = 32;
 const TILES_PER_CHUNK = 32;
@@ -521,7 +521,9 @@ export class WorldGameManager {
 
         // Pre-render chunk to a single canvas texture
         const chunkSeed = data.seed || (data.chunk_x * 7919 + data.chunk_y * 6271);
-        const chunkCanvas = this.terrainGen.renderChunk(data.terrain, chunkSeed);
+        // Terrain arrives as base64 of flat tile bytes (index ty * 32 + tx)
+        const terrain = Uint8Array.from(atob(data.terrain_b64), c => c.charCodeAt(0));
+        const chunkCanvas = this.terrainGen.renderChunk(terrain, chunkSeed);
 
         const textureKey = `chunk_${data.chunk_x}_${data.chunk_y}`;
         this.scene.textures.addCanvas(textureKey, chunkCanvas);